@@ -1,5 +1,9 @@
 import os
+import atexit
 import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from flask import Flask
 from werkzeug.middleware.proxy_fix import ProxyFix
 
@@ -36,6 +40,29 @@ app.config['DATA_FOLDER'] = DATA_FOLDER
 app.config['LOGS_FOLDER'] = LOGS_FOLDER
 app.config['TEMPLATES_FOLDER'] = TEMPLATES_FOLDER
 
+# Reject larger requests (e.g. statement uploads) before their body is read
+app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
+
+# Worker processes for remapping large transaction sets and reading long PDFs.
+# Each server worker gets its own pool, so it is kept small
+PROCESS_WORKERS = min(os.cpu_count() or 1, 4)
+_process_executor = None
+_process_executor_lock = threading.Lock()
+
+def get_process_executor():
+    """The process pool, created on first use and shut down at exit.
+
+    Workers are spawned rather than forked, so they do not inherit the
+    file caches or a lock held by another request thread.
+    """
+    global _process_executor
+    with _process_executor_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(max_workers=PROCESS_WORKERS,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_process_executor.shutdown)
+        return _process_executor
+
 # Import routes
 from routes import *
 
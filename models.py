@@ -1,10 +1,142 @@
+import functools
 import json
+import operator
+import re
+import unicodedata
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import re2
+except ImportError:  # Template and mapping patterns then always use re
+    re2 = None
+
+# Description cleaning patterns, compiled once instead of per Transaction
+_DATE_PREFIX_RE = re.compile(r"^\d{2}/\d{2}/\d{4}\s+")
+# Patterns: " -1.300,00", " 1.300,00", " R$ 1.300,00", "18/01 -1.300,00"
+_VALUE_SUFFIX_RES = (
+    re.compile(r"\s+(?:R\$\s*)?-?\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})(?:\s+R\$)?$"),  # Standard values
+    re.compile(r"\s+\d{2}/\d{2}\s+-?\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})$"),  # Date + value
+    re.compile(r"\s+-?\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})$"),  # Just value
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+# Constructs re2 lacks (lookaround, backreferences) or reads differently from re:
+# its \d, \s, \w and \b are ASCII-only, it takes {,n} literally and its $
+# never matches before a trailing newline
+_RE2_UNSAFE_RE = re.compile(r"\\[dDsSwWbB1-9]|\(\?<?[=!]|\{,|\$")
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile(pattern: str, flags: int = 0) -> re.Pattern:
+    """Compile a template or mapping pattern once for every object using it.
+    
+    With google-re2 installed, patterns it matches the same way run on its
+    linear-time engine, so user-written patterns cannot backtrack
+    catastrophically; the compiled object offers the same search/sub API.
+    """
+    compiled = re.compile(pattern, flags)
+    # re2 also places empty matches differently when substituting
+    if (re2 is not None and not flags & ~re.IGNORECASE
+            and not _RE2_UNSAFE_RE.search(pattern) and compiled.fullmatch("") is None):
+        try:
+            return re2.compile(("(?i)" if flags else "") + pattern)
+        except re2.error:
+            pass
+    return compiled
+
+
+class _CombiningMarkTable(dict):
+    """str.translate table deleting nonspacing marks (category Mn).
+
+    Code points are classified on first sight and memoized, so repeated
+    translations run entirely in C.
+    """
+
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        value = None if unicodedata.category(chr(codepoint)) == "Mn" else codepoint
+        self[codepoint] = value
+        return value
+
+
+# Seeded with the Combining Diacritical Marks block used by Latin accents
+_COMBINING_MARKS = _CombiningMarkTable(
+    (cp, None) for cp in range(0x300, 0x370) if unicodedata.category(chr(cp)) == "Mn"
+)
+
+# Latin-1 accented letters mapped straight to their unaccented base letter,
+# i.e. what NFD followed by dropping the combining marks gives for them
+_LATIN1_DEACCENT = str.maketrans(
+    {
+        cp: unicodedata.normalize("NFD", chr(cp)).translate(_COMBINING_MARKS)
+        for cp in range(0xA0, 0x100)
+        if unicodedata.decomposition(chr(cp))[:1] not in ("", "<")
+    }
+)
+
+
+def _clean_description(description: str) -> str:
+    """Clean description by removing date prefix and value suffix"""
+    cleaned = description.strip()
+
+    # Remove date prefix (e.g., "20/01/2025 PIX TRANSF..." -> "PIX TRANSF...")
+    cleaned = _DATE_PREFIX_RE.sub("", cleaned)
+
+    # Remove value suffix - more comprehensive patterns
+    for pattern in _VALUE_SUFFIX_RES:
+        cleaned = pattern.sub("", cleaned)
+
+    return cleaned.strip()
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_description(description: str) -> str:
+    """Normalize description for comparison.
+
+    Cached because statements repeat the same descriptions many times.
+    """
+    # Clean description first
+    cleaned = _clean_description(description)
+
+    # Remove accents (pure ASCII has none, so skip the decomposition)
+    if cleaned.isascii():
+        normalized = cleaned
+    elif max(cleaned) <= "\xff":
+        # Latin-1 text (the usual accented Portuguese) needs no decomposition
+        normalized = cleaned.translate(_LATIN1_DEACCENT)
+    else:
+        # Quick check first: text already in NFD needs no decomposition pass
+        normalized = cleaned
+        if not unicodedata.is_normalized("NFD", normalized):
+            normalized = unicodedata.normalize("NFD", normalized)
+        normalized = normalized.translate(_COMBINING_MARKS)
+
+    # Convert to lowercase and remove extra spaces
+    normalized = _WHITESPACE_RE.sub(" ", normalized.lower().strip())
+
+    # Remove special characters except spaces
+    normalized = _NON_WORD_RE.sub("", normalized)
+
+    return normalized
 
 
 class Transaction:
+    __slots__ = (
+        "id",
+        "data",
+        "descricao_original",
+        "descricao_normalizada",
+        "valor",
+        "tipo_movimentacao",
+        "banco",
+        "rotulo_contabil",
+        "conta_debito",
+        "conta_credito",
+        "historico_contabil",
+        "revisado_manualmente",
+    )
+
     def __init__(
         self,
         data: str,
@@ -14,10 +146,14 @@ class Transaction:
         banco: str,
         **kwargs,
     ):
-        self.id = kwargs.get("id", str(uuid.uuid4()))
+        # A fresh id is only generated when none is given
+        self.id = kwargs["id"] if "id" in kwargs else str(uuid.uuid4())
         self.data = data
         self.descricao_original = descricao_original
-        self.descricao_normalizada = self._normalize_description(descricao_original)
+        # Stored transactions already carry their normalized description
+        self.descricao_normalizada = kwargs.get("descricao_normalizada")
+        if self.descricao_normalizada is None:
+            self.descricao_normalizada = _normalize_description(descricao_original)
         self.valor = valor
         self.tipo_movimentacao = tipo_movimentacao
         self.banco = banco
@@ -29,46 +165,11 @@ class Transaction:
 
     def _normalize_description(self, description: str) -> str:
         """Normalize description for comparison"""
-        import re
-        import unicodedata
-
-        # Clean description first
-        cleaned = self._clean_description(description)
-
-        # Remove accents
-        normalized = unicodedata.normalize("NFD", cleaned)
-        normalized = "".join(c for c in normalized if unicodedata.category(c) != "Mn")
-
-        # Convert to lowercase and remove extra spaces
-        normalized = re.sub(r"\s+", " ", normalized.lower().strip())
-
-        # Remove special characters except spaces
-        normalized = re.sub(r"[^\w\s]", "", normalized)
-
-        return normalized
+        return _normalize_description(description)
 
     def _clean_description(self, description: str) -> str:
         """Clean description by removing date prefix and value suffix"""
-        import re
-
-        cleaned = description.strip()
-
-        # Remove date prefix (e.g., "20/01/2025 PIX TRANSF..." -> "PIX TRANSF...")
-        date_pattern = r"^\d{2}/\d{2}/\d{4}\s+"
-        cleaned = re.sub(date_pattern, "", cleaned)
-
-        # Remove value suffix - more comprehensive patterns
-        # Patterns: " -1.300,00", " 1.300,00", " R$ 1.300,00", "18/01 -1.300,00"
-        value_patterns = [
-            r"\s+(?:R\$\s*)?-?\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})(?:\s+R\$)?$",  # Standard values
-            r"\s+\d{2}/\d{2}\s+-?\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})$",  # Date + value
-            r"\s+-?\d{1,3}(?:[\.,]\d{3})*(?:[\.,]\d{2})$",  # Just value
-        ]
-
-        for pattern in value_patterns:
-            cleaned = re.sub(pattern, "", cleaned)
-
-        return cleaned.strip()
+        return _clean_description(description)
 
     def to_dict(self) -> Dict:
         return {
@@ -88,10 +189,47 @@ class Transaction:
 
     @classmethod
     def from_dict(cls, data: Dict):
+        # Stored records carry every field, so they skip __init__'s defaults
+        if data.keys() == _TRANSACTION_FIELDS and data["descricao_normalizada"] is not None:
+            transaction = object.__new__(cls)
+            (
+                transaction.id,
+                transaction.data,
+                transaction.descricao_original,
+                transaction.descricao_normalizada,
+                transaction.valor,
+                transaction.tipo_movimentacao,
+                transaction.banco,
+                transaction.rotulo_contabil,
+                transaction.conta_debito,
+                transaction.conta_credito,
+                transaction.historico_contabil,
+                transaction.revisado_manualmente,
+            ) = _transaction_values(data)
+            return transaction
         return cls(**data)
 
 
+_TRANSACTION_FIELDS = frozenset(Transaction.__slots__)
+_transaction_values = operator.itemgetter(*Transaction.__slots__)
+
+
 class BankTemplate:
+    __slots__ = (
+        "banco",
+        "formato",
+        "_regex_data",
+        "_regex_valor",
+        "_regex_descricao",
+        "_re_data",
+        "_re_valor",
+        "_re_descricao",
+        "modo_leitura",
+        "colunas_csv",
+        "linhas_ignoradas_topo",
+        "linhas_ignoradas_rodape",
+    )
+
     def __init__(self, banco: str, formato: str, **kwargs):
         self.banco = banco
         self.formato = formato
@@ -103,6 +241,52 @@ class BankTemplate:
         self.linhas_ignoradas_topo = kwargs.get("linhas_ignoradas_topo", 0)
         self.linhas_ignoradas_rodape = kwargs.get("linhas_ignoradas_rodape", 0)
 
+    # The regex strings are compiled on first use and recompiled after edits
+    @property
+    def regex_data(self) -> str:
+        return self._regex_data
+
+    @regex_data.setter
+    def regex_data(self, value: str) -> None:
+        self._regex_data = value
+        self._re_data = None
+
+    @property
+    def regex_valor(self) -> str:
+        return self._regex_valor
+
+    @regex_valor.setter
+    def regex_valor(self, value: str) -> None:
+        self._regex_valor = value
+        self._re_valor = None
+
+    @property
+    def regex_descricao(self) -> str:
+        return self._regex_descricao
+
+    @regex_descricao.setter
+    def regex_descricao(self, value: str) -> None:
+        self._regex_descricao = value
+        self._re_descricao = None
+
+    @property
+    def compiled_data(self) -> re.Pattern:
+        if self._re_data is None:
+            self._re_data = _compile(self._regex_data)
+        return self._re_data
+
+    @property
+    def compiled_valor(self) -> re.Pattern:
+        if self._re_valor is None:
+            self._re_valor = _compile(self._regex_valor)
+        return self._re_valor
+
+    @property
+    def compiled_descricao(self) -> re.Pattern:
+        if self._re_descricao is None:
+            self._re_descricao = _compile(self._regex_descricao)
+        return self._re_descricao
+
     def to_dict(self) -> Dict:
         return {
             "banco": self.banco,
@@ -122,8 +306,26 @@ class BankTemplate:
 
 
 class AccountingMapping:
+    __slots__ = (
+        "id",
+        "rotulo_contabil",
+        "descricao_longa",
+        "tipo_transacao",
+        "_palavras_chave",
+        "_regex_avancado",
+        "conta_debito",
+        "conta_credito",
+        "historico_contabil_padrao",
+        "_excecoes",
+        "_sub_mapeamentos",
+        "_palavras_chave_lower",
+        "_re_avancado",
+        "_excecoes_lower",
+        "_sub_mapeamentos_lower",
+    )
+
     def __init__(self, rotulo_contabil: str, tipo_transacao: str, **kwargs):
-        self.id = kwargs.get("id", str(uuid.uuid4()))
+        self.id = kwargs["id"] if "id" in kwargs else str(uuid.uuid4())
         self.rotulo_contabil = rotulo_contabil
         self.descricao_longa = kwargs.get("descricao_longa", "")
         self.tipo_transacao = tipo_transacao
@@ -135,6 +337,71 @@ class AccountingMapping:
         self.excecoes = kwargs.get("excecoes", [])
         self.sub_mapeamentos = kwargs.get("sub_mapeamentos", [])
 
+    # Matching forms of the terms are derived on first use and reset on edits
+    @property
+    def palavras_chave(self) -> List[str]:
+        return self._palavras_chave
+
+    @palavras_chave.setter
+    def palavras_chave(self, value: List[str]) -> None:
+        self._palavras_chave = value
+        self._palavras_chave_lower = None
+
+    @property
+    def regex_avancado(self) -> str:
+        return self._regex_avancado
+
+    @regex_avancado.setter
+    def regex_avancado(self, value: str) -> None:
+        self._regex_avancado = value
+        self._re_avancado = None
+
+    @property
+    def excecoes(self) -> List[str]:
+        return self._excecoes
+
+    @excecoes.setter
+    def excecoes(self, value: List[str]) -> None:
+        self._excecoes = value
+        self._excecoes_lower = None
+
+    @property
+    def sub_mapeamentos(self) -> List[Dict]:
+        return self._sub_mapeamentos
+
+    @sub_mapeamentos.setter
+    def sub_mapeamentos(self, value: List[Dict]) -> None:
+        self._sub_mapeamentos = value
+        self._sub_mapeamentos_lower = None
+
+    @property
+    def palavras_chave_lower(self) -> List[str]:
+        if self._palavras_chave_lower is None:
+            self._palavras_chave_lower = [k.lower() for k in self._palavras_chave]
+        return self._palavras_chave_lower
+
+    @property
+    def compiled_regex_avancado(self) -> Optional[re.Pattern]:
+        if self._re_avancado is None and self._regex_avancado:
+            self._re_avancado = _compile(self._regex_avancado, re.IGNORECASE)
+        return self._re_avancado
+
+    @property
+    def excecoes_lower(self) -> List[str]:
+        if self._excecoes_lower is None:
+            self._excecoes_lower = [e.lower() for e in self._excecoes]
+        return self._excecoes_lower
+
+    @property
+    def sub_mapeamentos_lower(self) -> List[Tuple[Dict, List[str]]]:
+        """Each sub-mapping paired with its lowercased keywords"""
+        if self._sub_mapeamentos_lower is None:
+            self._sub_mapeamentos_lower = [
+                (sub, [k.lower() for k in sub.get("palavras_chave", [])])
+                for sub in self._sub_mapeamentos
+            ]
+        return self._sub_mapeamentos_lower
+
     def to_dict(self) -> Dict:
         return {
             "id": self.id,
@@ -156,8 +423,25 @@ class AccountingMapping:
 
 
 class CustomRule:
+    __slots__ = (
+        "id",
+        "_termo_chave",
+        "_termo_chave_lower",
+        "corresponde_exatamente",
+        "considerar_valor",
+        "valor_exato",
+        "valor_min",
+        "valor_max",
+        "tipo_movimentacao_regra",
+        "rotulo_contabil_aplicar",
+        "conta_debito_aplicar",
+        "conta_credito_aplicar",
+        "historico_contabil_aplicar",
+        "data_criacao",
+    )
+
     def __init__(self, termo_chave: str, **kwargs):
-        self.id = kwargs.get("id", str(uuid.uuid4()))
+        self.id = kwargs["id"] if "id" in kwargs else str(uuid.uuid4())
         self.termo_chave = termo_chave
         self.corresponde_exatamente = kwargs.get("corresponde_exatamente", False)
         self.considerar_valor = kwargs.get("considerar_valor", False)
@@ -173,6 +457,20 @@ class CustomRule:
             "data_criacao", datetime.now().strftime("%Y-%m-%d")
         )
 
+    @property
+    def termo_chave(self) -> str:
+        return self._termo_chave
+
+    @termo_chave.setter
+    def termo_chave(self, value: str) -> None:
+        self._termo_chave = value
+        # Lowercased once here instead of on every comparison
+        self._termo_chave_lower = value.lower() if isinstance(value, str) else value
+
+    @property
+    def termo_chave_lower(self) -> str:
+        return self._termo_chave_lower
+
     def to_dict(self) -> Dict:
         return {
             "id": self.id,
@@ -1,31 +1,97 @@
+import io
 import os
 import json
 import logging
+import copy
+import mimetypes
+import threading
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file
+import numpy as np
+from flask import Response, render_template, request, redirect, url_for, flash, jsonify, send_file, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-from app import app
+from app import app, get_process_executor, PROCESS_WORKERS
 from models import Transaction, BankTemplate, AccountingMapping, CustomRule
 from utils.pdf_processor import PDFProcessor
-from utils.transaction_mapper import TransactionMapper
+from utils.transaction_mapper import TransactionMapper, map_transaction_fields
 from utils.file_handlers import FileHandler
-from utils.export_manager import ExportManager
+from utils.export_manager import ExportManager, EXPORT_CHUNK_ROWS
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Below this many transactions a remap is faster in-process than sharded
+PARALLEL_REMAP_MIN_TRANSACTIONS = 5000
+
+# Rows rendered per page of /transactions (overridable with ?per_page=)
+TRANSACTIONS_PER_PAGE = 100
+MAX_TRANSACTIONS_PER_PAGE = 1000
+
+# Copy uploads to disk in 1 MiB blocks rather than Werkzeug's default 16 KiB
+UPLOAD_BUFFER_SIZE = 1 << 20
+
+# Recent in-memory exports, reused while the transactions and layouts are unchanged
+EXPORT_CACHE_SIZE = 8
+_export_cache = {}
+_export_cache_lock = threading.Lock()
+
+def _mapping_state(transaction):
+    """Fields a (re)mapping may change, to tell whether a save is needed"""
+    return (transaction.descricao_normalizada, transaction.rotulo_contabil, transaction.conta_debito,
+            transaction.conta_credito, transaction.historico_contabil)
+
+def _export_versions():
+    """Versions of the files an export is built from"""
+    return (FileHandler.file_version('data/transacoes.json'),
+            FileHandler.file_version('data/layouts_exportacao.json'))
+
+def _with_edits(transactions, edited):
+    """The transactions with each edited copy (keyed by id() of the loaded
+    object it copies) in place of its original"""
+    return [edited.get(id(t), t) for t in transactions]
+
+def _date_window(frame, date_from, date_to):
+    """Rows of the transaction frame dated within [date_from, date_to].
+
+    The frame is sorted by date (newest first), so the range is a contiguous
+    block found by binary search instead of comparing every row.
+    """
+    dates = frame['data'].to_numpy()[::-1]  # oldest first
+    start, stop = 0, len(dates)
+    if date_to:
+        start = len(dates) - np.searchsorted(dates, date_to, side='right')
+    if date_from:
+        stop = len(dates) - np.searchsorted(dates, date_from, side='left')
+    return frame.iloc[start:max(start, stop)]
+
+def _map_transactions(transactions):
+    """Map transactions in place, sharded across the worker processes when
+    there are enough of them to outweigh the pickling"""
+    if len(transactions) >= PARALLEL_REMAP_MIN_TRANSACTIONS:
+        # Shard across the worker processes and merge back in order
+        executor: ProcessPoolExecutor = get_process_executor()
+        chunk_size = -(-len(transactions) // PROCESS_WORKERS)
+        chunks = [transactions[i:i + chunk_size] for i in range(0, len(transactions), chunk_size)]
+        fields = [f for chunk_fields in executor.map(map_transaction_fields, chunks) for f in chunk_fields]
+        for transaction, (rotulo, debito, credito, historico) in zip(transactions, fields):
+            transaction.rotulo_contabil = rotulo
+            transaction.conta_debito = debito
+            transaction.conta_credito = credito
+            transaction.historico_contabil = historico
+    else:
+        TransactionMapper().map_transactions(transactions)
+
 @app.route('/')
 def index():
     """Main dashboard"""
     try:
-        # Get transaction statistics
-        transactions = FileHandler.load_transactions()
-        total_transactions = len(transactions)
-        mapped_transactions = sum(1 for t in transactions if t.rotulo_contabil)
-
-        # Get recent transactions
-        recent_transactions = sorted(transactions, key=lambda x: x.data, reverse=True)[:5]
+        # Get transaction statistics and recent transactions (cached per file version)
+        transaction_stats = FileHandler.load_transaction_stats()
+        total_transactions = transaction_stats['total']
+        mapped_transactions = transaction_stats['mapped']
+        recent_transactions = transaction_stats['recent']
 
         stats = {
             'total_transactions': total_transactions,
@@ -36,7 +102,7 @@ def index():
 
         return render_template('index.html', stats=stats, recent_transactions=recent_transactions)
     except Exception as e:
-        logger.error(f"Error loading dashboard: {str(e)}")
+        logger.exception("Error loading dashboard: %s", e)
         return render_template('index.html', stats={'total_transactions': 0, 'mapped_transactions': 0, 'unmapped_transactions': 0, 'mapping_percentage': 0}, recent_transactions=[])
 
 @app.route('/import', methods=['GET', 'POST'])
@@ -56,27 +122,21 @@ def import_statement():
             if file:
                 filename = secure_filename(file.filename)
                 filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
+                file.save(filepath, buffer_size=UPLOAD_BUFFER_SIZE)
 
                 # Get selected bank template
                 bank_template = request.form.get('bank_template', 'auto')
 
                 # Process the file
-                processor = PDFProcessor()
+                processor = PDFProcessor(get_process_executor(), PROCESS_WORKERS)
                 transactions = processor.process_file(filepath, bank_template)
 
                 if transactions:
                     # Map transactions automatically
-                    mapper = TransactionMapper()
-                    mapped_transactions = []
-                    for transaction in transactions:
-                        mapped_transaction = mapper.map_transaction(transaction)
-                        mapped_transactions.append(mapped_transaction)
+                    mapped_transactions = TransactionMapper().map_transactions(transactions)
 
                     # Save transactions
-                    existing_transactions = FileHandler.load_transactions()
-                    all_transactions = existing_transactions + mapped_transactions
-                    FileHandler.save_transactions(all_transactions)
+                    FileHandler.append_transactions(mapped_transactions)
 
                     flash(f'Arquivo importado com sucesso! {len(mapped_transactions)} transações processadas.', 'success')
                     return redirect(url_for('transactions'))
@@ -84,8 +144,11 @@ def import_statement():
                     flash('Não foi possível processar o arquivo. Verifique o formato e tente novamente.', 'error')
                     return redirect(request.url)
 
+        except RequestEntityTooLarge:
+            # Answered by request_too_large
+            raise
         except Exception as e:
-            logger.error(f"Error importing file: {str(e)}")
+            logger.exception("Error importing file: %s", e)
             flash(f'Erro ao importar arquivo: {str(e)}', 'error')
             return redirect(request.url)
 
@@ -102,42 +165,48 @@ def transactions():
         mapping_filter = request.args.get('mapping', '')
         date_from = request.args.get('date_from', '')
         date_to = request.args.get('date_to', '')
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', TRANSACTIONS_PER_PAGE, type=int)
+        per_page = min(max(per_page, 1), MAX_TRANSACTIONS_PER_PAGE)
+
+        # Filter the columnar view with vectorized masks; its rows are
+        # already sorted by date (newest first), so no per-request sort
+        frame = FileHandler.load_transaction_frame()
+        window = _date_window(frame, date_from, date_to)
+        mask = np.ones(len(window), dtype=bool)
+        if bank_filter:
+            mask &= (window['banco'] == bank_filter).to_numpy()
+        if mapping_filter in ('mapped', 'unmapped', 'ignored'):
+            mask &= (window['situacao'] == mapping_filter).to_numpy()
+        filtered = window['transacao'].to_numpy()[mask]
 
-        # Load transactions
-        all_transactions = FileHandler.load_transactions()
+        # Only the requested page is turned into a list and rendered
+        total = len(filtered)
+        pages = max(-(-total // per_page), 1)
+        page = min(max(page, 1), pages)
+        start = (page - 1) * per_page
+        page_transactions = filtered[start:start + per_page].tolist()
 
-        # Apply filters
-        filtered_transactions = all_transactions
-        if bank_filter:
-            filtered_transactions = [t for t in filtered_transactions if t.banco == bank_filter]
-        if mapping_filter == 'mapped':
-            filtered_transactions = [t for t in filtered_transactions if t.rotulo_contabil and t.rotulo_contabil != 'IGNORAR']
-        elif mapping_filter == 'unmapped':
-            filtered_transactions = [t for t in filtered_transactions if not t.rotulo_contabil or t.rotulo_contabil == '']
-        elif mapping_filter == 'ignored':
-            filtered_transactions = [t for t in filtered_transactions if t.rotulo_contabil == 'IGNORAR']
-        if date_from:
-            filtered_transactions = [t for t in filtered_transactions if t.data >= date_from]
-        if date_to:
-            filtered_transactions = [t for t in filtered_transactions if t.data <= date_to]
-
-        # Sort by date (newest first)
-        filtered_transactions.sort(key=lambda x: x.data, reverse=True)
-
-        # Get unique banks for filter
-        banks = sorted(list(set(t.banco for t in all_transactions)))
+        # Get unique banks for filter (the sorted categories of 'banco')
+        banks = frame['banco'].cat.categories.tolist()
 
         return render_template('transactions.html', 
-                             transactions=filtered_transactions, 
+                             transactions=page_transactions, 
                              banks=banks,
                              current_filters={
                                  'bank': bank_filter,
                                  'mapping': mapping_filter,
                                  'date_from': date_from,
                                  'date_to': date_to
+                             },
+                             pagination={
+                                 'page': page,
+                                 'per_page': per_page,
+                                 'pages': pages,
+                                 'total': total
                              })
     except Exception as e:
-        logger.error(f"Error loading transactions: {str(e)}")
+        logger.exception("Error loading transactions: %s", e)
         flash(f'Erro ao carregar transações: {str(e)}', 'error')
         return render_template('transactions.html', transactions=[], banks=[], current_filters={})
 
@@ -145,61 +214,87 @@ def transactions():
 def edit_transaction(transaction_id):
     """Edit a transaction"""
     try:
-        transactions = FileHandler.load_transactions()
-        transaction = next((t for t in transactions if t.id == transaction_id), None)
-
-        if not transaction:
-            flash('Transação não encontrada', 'error')
-            return redirect(url_for('transactions'))
-
-        # Update transaction
-        transaction.rotulo_contabil = request.form.get('rotulo_contabil', '')
-        transaction.conta_debito = request.form.get('conta_debito', '')
-        transaction.conta_credito = request.form.get('conta_credito', '')
-        transaction.historico_contabil = request.form.get('historico_contabil', '')
-        transaction.revisado_manualmente = True
-
-        # Check if user wants to create a rule
-        create_rule = request.form.get('create_rule', False)
-        if create_rule:
-            rule_type = request.form.get('rule_type', 'contains')
-
-            # Create custom rule
-            custom_rule = CustomRule(
-                termo_chave=transaction.descricao_normalizada,
-                corresponde_exatamente=(rule_type == 'exact'),
-                considerar_valor=(rule_type == 'exact_value'),
-                valor_exato=transaction.valor if rule_type == 'exact_value' else None,
-                tipo_movimentacao_regra=transaction.tipo_movimentacao.lower(),
-                rotulo_contabil_aplicar=transaction.rotulo_contabil,
-                conta_debito_aplicar=transaction.conta_debito,
-                conta_credito_aplicar=transaction.conta_credito,
-                historico_contabil_aplicar=transaction.historico_contabil
-            )
-
-            # Save rule
-            rules = FileHandler.load_custom_rules()
-            rules.append(custom_rule)
-            FileHandler.save_custom_rules(rules)
-
-            # Apply rule to similar transactions
-            mapper = TransactionMapper()
-            for t in transactions:
-                if t.id != transaction_id and not t.revisado_manualmente:
-                    if mapper.matches_custom_rule(t, custom_rule):
-                        t.rotulo_contabil = custom_rule.rotulo_contabil_aplicar
-                        t.conta_debito = custom_rule.conta_debito_aplicar
-                        t.conta_credito = custom_rule.conta_credito_aplicar
-                        t.historico_contabil = custom_rule.historico_contabil_aplicar
-
-        # Save transactions
-        FileHandler.save_transactions(transactions)
+        with FileHandler.transactions_lock():
+            transactions = FileHandler.load_transactions()
+            original = FileHandler.index_transactions(transactions).get(transaction_id)
+
+            if not original:
+                flash('Transação não encontrada', 'error')
+                return redirect(url_for('transactions'))
+
+            # Loaded transactions are shared with other requests: edit copies
+            transaction = copy.copy(original)
+            edited = {id(original): transaction}
+
+            # Update transaction
+            updates = {
+                'rotulo_contabil': request.form.get('rotulo_contabil', ''),
+                'conta_debito': request.form.get('conta_debito', ''),
+                'conta_credito': request.form.get('conta_credito', ''),
+                'historico_contabil': request.form.get('historico_contabil', ''),
+                'revisado_manualmente': True
+            }
+            changed = any(getattr(transaction, field) != value for field, value in updates.items())
+            for field, value in updates.items():
+                setattr(transaction, field, value)
+
+            # Check if user wants to create a rule
+            create_rule = request.form.get('create_rule', False)
+            if create_rule:
+                rule_type = request.form.get('rule_type', 'contains')
+
+                # Create custom rule
+                custom_rule = CustomRule(
+                    termo_chave=transaction.descricao_normalizada,
+                    corresponde_exatamente=(rule_type == 'exact'),
+                    considerar_valor=(rule_type == 'exact_value'),
+                    valor_exato=transaction.valor if rule_type == 'exact_value' else None,
+                    tipo_movimentacao_regra=transaction.tipo_movimentacao.lower(),
+                    rotulo_contabil_aplicar=transaction.rotulo_contabil,
+                    conta_debito_aplicar=transaction.conta_debito,
+                    conta_credito_aplicar=transaction.conta_credito,
+                    historico_contabil_aplicar=transaction.historico_contabil
+                )
+
+                # Save rule
+                rules = FileHandler.load_custom_rules()
+                rules.append(custom_rule)
+                FileHandler.save_custom_rules(rules)
+
+                # Apply rule to similar transactions, only looking at those whose
+                # description can match instead of scanning every transaction
+                groups = FileHandler.group_transactions_by_description(transactions)
+                term = custom_rule.termo_chave_lower
+                if custom_rule.corresponde_exatamente:
+                    similar = groups.get(term, [])
+                else:
+                    similar = [t for description, group in groups.items()
+                               if isinstance(description, str) and term in description
+                               for t in group]
+
+                mapper = TransactionMapper()
+                pending = [t for t in similar if t.id != transaction_id and not t.revisado_manualmente]
+                applied = (
+                    custom_rule.rotulo_contabil_aplicar,
+                    custom_rule.conta_debito_aplicar,
+                    custom_rule.conta_credito_aplicar,
+                    custom_rule.historico_contabil_aplicar
+                )
+                for t in mapper.select_custom_rule_matches(pending, custom_rule):
+                    if (t.rotulo_contabil, t.conta_debito, t.conta_credito, t.historico_contabil) != applied:
+                        t = edited.setdefault(id(t), copy.copy(t))
+                        t.rotulo_contabil, t.conta_debito, t.conta_credito, t.historico_contabil = applied
+                        changed = True
+
+            # Save transactions (the whole store is rewritten, so skip no-op edits)
+            if changed:
+                FileHandler.save_transactions(_with_edits(transactions, edited))
 
         flash('Transação atualizada com sucesso!', 'success')
         return redirect(url_for('transactions'))
 
     except Exception as e:
-        logger.error(f"Error editing transaction: {str(e)}")
+        logger.exception("Error editing transaction: %s", e)
         flash(f'Erro ao editar transação: {str(e)}', 'error')
         return redirect(url_for('transactions'))
 
@@ -207,22 +302,22 @@ def edit_transaction(transaction_id):
 def remap_transactions():
     """Remap all transactions"""
     try:
-        transactions = FileHandler.load_transactions()
-        mapper = TransactionMapper()
-
-        for transaction in transactions:
-            if not transaction.revisado_manualmente:
-                mapped_transaction = mapper.map_transaction(transaction)
-                transaction.rotulo_contabil = mapped_transaction.rotulo_contabil
-                transaction.conta_debito = mapped_transaction.conta_debito
-                transaction.conta_credito = mapped_transaction.conta_credito
-                transaction.historico_contabil = mapped_transaction.historico_contabil
-
-        FileHandler.save_transactions(transactions)
+        with FileHandler.transactions_lock():
+            transactions = FileHandler.load_transactions()
+            # Remap copies, leaving the shared loaded objects untouched
+            transactions = [t if t.revisado_manualmente else copy.copy(t) for t in transactions]
+            pending = [t for t in transactions if not t.revisado_manualmente]
+            before = [_mapping_state(t) for t in pending]
+
+            _map_transactions(pending)
+
+            # The whole store is rewritten, so only save if a mapping changed
+            if any(_mapping_state(t) != fields for t, fields in zip(pending, before)):
+                FileHandler.save_transactions(transactions)
         flash('Transações remapeadas com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error remapping transactions: {str(e)}")
+        logger.exception("Error remapping transactions: %s", e)
         flash(f'Erro ao remapear transações: {str(e)}', 'error')
 
     return redirect(url_for('transactions'))
@@ -234,7 +329,7 @@ def clear_transactions():
         FileHandler.save_transactions([])
         flash('Todas as transações foram removidas!', 'success')
     except Exception as e:
-        logger.error(f"Error clearing transactions: {str(e)}")
+        logger.exception("Error clearing transactions: %s", e)
         flash(f'Erro ao limpar transações: {str(e)}', 'error')
 
     return redirect(url_for('transactions'))
@@ -243,26 +338,24 @@ def clear_transactions():
 def refresh_descriptions():
     """Refresh normalized descriptions for all transactions"""
     try:
-        transactions = FileHandler.load_transactions()
-        mapper = TransactionMapper()
-        
-        for transaction in transactions:
-            # Recreate normalized description with fixed cleaning
-            transaction.descricao_normalizada = transaction._normalize_description(transaction.descricao_original)
+        with FileHandler.transactions_lock():
+            # Refresh copies, leaving the shared loaded objects untouched
+            transactions = list(map(copy.copy, FileHandler.load_transactions()))
+            before = [_mapping_state(t) for t in transactions]
+            
+            for transaction in transactions:
+                # Recreate normalized description with fixed cleaning
+                transaction.descricao_normalizada = transaction._normalize_description(transaction.descricao_original)
             
             # Only remap if not manually reviewed
-            if not transaction.revisado_manualmente:
-                mapped_transaction = mapper.map_transaction(transaction)
-                transaction.rotulo_contabil = mapped_transaction.rotulo_contabil
-                transaction.conta_debito = mapped_transaction.conta_debito
-                transaction.conta_credito = mapped_transaction.conta_credito
-                transaction.historico_contabil = mapped_transaction.historico_contabil
-        
-        FileHandler.save_transactions(transactions)
+            _map_transactions([t for t in transactions if not t.revisado_manualmente])
+            
+            if any(_mapping_state(t) != fields for t, fields in zip(transactions, before)):
+                FileHandler.save_transactions(transactions)
         flash('Descrições atualizadas e transações remapeadas com sucesso!', 'success')
         
     except Exception as e:
-        logger.error(f"Error refreshing descriptions: {str(e)}")
+        logger.exception("Error refreshing descriptions: %s", e)
         flash(f'Erro ao atualizar descrições: {str(e)}', 'error')
     
     return redirect(url_for('transactions'))
@@ -283,20 +376,25 @@ def remap_selected_transactions():
             flash('Nenhuma transação selecionada.', 'warning')
             return redirect(url_for('transactions'))
 
-        transactions = FileHandler.load_transactions()
-        mapper = TransactionMapper()
-        updated_count = 0
-
-        for transaction in transactions:
-            if transaction.id in transaction_ids and not transaction.revisado_manualmente:
-                mapped_transaction = mapper.map_transaction(transaction)
-                transaction.rotulo_contabil = mapped_transaction.rotulo_contabil
-                transaction.conta_debito = mapped_transaction.conta_debito
-                transaction.conta_credito = mapped_transaction.conta_credito
-                transaction.historico_contabil = mapped_transaction.historico_contabil
-                updated_count += 1
-
-        FileHandler.save_transactions(transactions)
+        with FileHandler.transactions_lock():
+            transactions = FileHandler.load_transactions()
+            transactions_by_id = FileHandler.index_transactions(transactions)
+
+            # Look up each selected id instead of scanning the id list per transaction,
+            # and remap copies, leaving the shared loaded objects untouched
+            edited = {
+                id(transaction): copy.copy(transaction)
+                for transaction in map(transactions_by_id.get, dict.fromkeys(transaction_ids))
+                if transaction and not transaction.revisado_manualmente
+            }
+            selected = list(edited.values())
+            before = [_mapping_state(transaction) for transaction in selected]
+            TransactionMapper().map_transactions(selected)
+            changed = any(_mapping_state(transaction) != state for transaction, state in zip(selected, before))
+            updated_count = len(selected)
+
+            if changed:
+                FileHandler.save_transactions(_with_edits(transactions, edited))
         
         if request.is_json:
             return jsonify({'success': True, 'message': f'{updated_count} transações remapeadas com sucesso!'})
@@ -304,7 +402,7 @@ def remap_selected_transactions():
         flash(f'{updated_count} transações remapeadas com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error remapping selected transactions: {str(e)}")
+        logger.exception("Error remapping selected transactions: %s", e)
         if request.is_json:
             return jsonify({'success': False, 'error': str(e)}), 500
         flash(f'Erro ao remapear transações selecionadas: {str(e)}', 'error')
@@ -327,14 +425,17 @@ def delete_selected_transactions():
             flash('Nenhuma transação selecionada.', 'warning')
             return redirect(url_for('transactions'))
 
-        transactions = FileHandler.load_transactions()
-        original_count = len(transactions)
+        with FileHandler.transactions_lock():
+            transactions = FileHandler.load_transactions()
+            original_count = len(transactions)
 
-        # Filter out selected transactions
-        transactions = [t for t in transactions if t.id not in transaction_ids]
-        deleted_count = original_count - len(transactions)
+            # Filter out selected transactions
+            id_set = set(transaction_ids)
+            transactions = [t for t in transactions if t.id not in id_set]
+            deleted_count = original_count - len(transactions)
 
-        FileHandler.save_transactions(transactions)
+            if deleted_count:
+                FileHandler.save_transactions(transactions)
         
         if request.is_json:
             return jsonify({'success': True, 'message': f'{deleted_count} transações excluídas com sucesso!'})
@@ -342,7 +443,7 @@ def delete_selected_transactions():
         flash(f'{deleted_count} transações excluídas com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error deleting selected transactions: {str(e)}")
+        logger.exception("Error deleting selected transactions: %s", e)
         if request.is_json:
             return jsonify({'success': False, 'error': str(e)}), 500
         flash(f'Erro ao excluir transações selecionadas: {str(e)}', 'error')
@@ -356,7 +457,7 @@ def templates():
         templates = FileHandler.load_bank_templates()
         return render_template('templates.html', templates=templates)
     except Exception as e:
-        logger.error(f"Error loading templates: {str(e)}")
+        logger.exception("Error loading templates: %s", e)
         return render_template('templates.html', templates=[])
 
 @app.route('/templates/create', methods=['POST'])
@@ -387,7 +488,7 @@ def create_template():
         flash('Template criado com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error creating template: {str(e)}")
+        logger.exception("Error creating template: %s", e)
         flash(f'Erro ao criar template: {str(e)}', 'error')
 
     return redirect(url_for('templates'))
@@ -398,7 +499,7 @@ def edit_template(template_id):
     try:
         # Load existing template
         templates = FileHandler.load_bank_templates()
-        template = next((t for t in templates if t.banco.lower().replace(' ', '_') == template_id), None)
+        template = FileHandler.index_bank_templates(templates).get(template_id)
 
         if not template:
             flash('Template não encontrado', 'error')
@@ -431,7 +532,7 @@ def edit_template(template_id):
         flash('Template atualizado com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error editing template: {str(e)}")
+        logger.exception("Error editing template: %s", e)
         flash(f'Erro ao editar template: {str(e)}', 'error')
 
     return redirect(url_for('templates'))
@@ -444,7 +545,7 @@ def delete_template(template_id):
         flash('Template excluído com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error deleting template: {str(e)}")
+        logger.exception("Error deleting template: %s", e)
         flash(f'Erro ao excluir template: {str(e)}', 'error')
 
     return redirect(url_for('templates'))
@@ -454,7 +555,7 @@ def get_template(template_id):
     """Get template data for editing"""
     try:
         templates = FileHandler.load_bank_templates()
-        template = next((t for t in templates if t.banco.lower().replace(' ', '_') == template_id), None)
+        template = FileHandler.index_bank_templates(templates).get(template_id)
 
         if not template:
             return jsonify({'error': 'Template não encontrado'}), 404
@@ -462,7 +563,7 @@ def get_template(template_id):
         return jsonify(template.to_dict())
 
     except Exception as e:
-        logger.error(f"Error getting template: {str(e)}")
+        logger.exception("Error getting template: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/mappings')
@@ -472,7 +573,7 @@ def mappings():
         mappings = FileHandler.load_accounting_mappings()
         return render_template('mappings.html', mappings=mappings)
     except Exception as e:
-        logger.error(f"Error loading mappings: {str(e)}")
+        logger.exception("Error loading mappings: %s", e)
         return render_template('mappings.html', mappings=[])
 
 @app.route('/mappings/create', methods=['POST'])
@@ -498,7 +599,7 @@ def create_mapping():
         flash('Mapeamento criado com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error creating mapping: {str(e)}")
+        logger.exception("Error creating mapping: %s", e)
         flash(f'Erro ao criar mapeamento: {str(e)}', 'error')
 
     return redirect(url_for('mappings'))
@@ -508,7 +609,7 @@ def edit_mapping(mapping_id):
     """Edit an existing accounting mapping"""
     try:
         mappings = FileHandler.load_accounting_mappings()
-        mapping = next((m for m in mappings if m.id == mapping_id), None)
+        mapping = FileHandler.index_accounting_mappings(mappings).get(mapping_id)
 
         if not mapping:
             flash('Mapeamento não encontrado', 'error')
@@ -529,7 +630,7 @@ def edit_mapping(mapping_id):
         flash('Mapeamento atualizado com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error editing mapping: {str(e)}")
+        logger.exception("Error editing mapping: %s", e)
         flash(f'Erro ao editar mapeamento: {str(e)}', 'error')
 
     return redirect(url_for('mappings'))
@@ -539,13 +640,14 @@ def delete_mapping(mapping_id):
     """Delete an accounting mapping"""
     try:
         mappings = FileHandler.load_accounting_mappings()
-        mappings = [m for m in mappings if m.id != mapping_id]
+        remaining = [m for m in mappings if m.id != mapping_id]
 
-        FileHandler.save_accounting_mappings(mappings)
+        if len(remaining) != len(mappings):
+            FileHandler.save_accounting_mappings(remaining)
         flash('Mapeamento excluído com sucesso!', 'success')
 
     except Exception as e:
-        logger.error(f"Error deleting mapping: {str(e)}")
+        logger.exception("Error deleting mapping: %s", e)
         flash(f'Erro ao excluir mapeamento: {str(e)}', 'error')
 
     return redirect(url_for('mappings'))
@@ -555,7 +657,7 @@ def get_mapping(mapping_id):
     """Get mapping data for editing"""
     try:
         mappings = FileHandler.load_accounting_mappings()
-        mapping = next((m for m in mappings if m.id == mapping_id), None)
+        mapping = FileHandler.index_accounting_mappings(mappings).get(mapping_id)
 
         if not mapping:
             return jsonify({'error': 'Mapeamento não encontrado'}), 404
@@ -563,7 +665,7 @@ def get_mapping(mapping_id):
         return jsonify(mapping.to_dict())
 
     except Exception as e:
-        logger.error(f"Error getting mapping: {str(e)}")
+        logger.exception("Error getting mapping: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/mappings/presets/save', methods=['POST'])
@@ -577,9 +679,6 @@ def save_mapping_preset():
         # Load current mappings
         current_mappings = FileHandler.load_accounting_mappings()
 
-        # Load existing presets
-        presets = FileHandler.load_mapping_presets()
-
         # Create new preset
         new_preset = {
             'id': str(uuid.uuid4()),
@@ -589,16 +688,13 @@ def save_mapping_preset():
             'mappings': [mapping.to_dict() for mapping in current_mappings]
         }
 
-        # Add to presets list
-        presets.append(new_preset)
-
-        # Save presets
-        FileHandler.save_mapping_presets(presets)
+        # Add to the saved presets
+        FileHandler.append_mapping_preset(new_preset)
 
         return jsonify({'success': True, 'message': f'Preset "{preset_name}" salvo com sucesso!'})
 
     except Exception as e:
-        logger.error(f"Error saving preset: {str(e)}")
+        logger.exception("Error saving preset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/mappings/presets/load/<preset_id>', methods=['POST'])
@@ -624,37 +720,20 @@ def load_mapping_preset(preset_id):
         return jsonify({'success': True, 'message': f'Preset "{preset["name"]}" carregado com sucesso!'})
 
     except Exception as e:
-        logger.error(f"Error loading preset: {str(e)}")
+        logger.exception("Error loading preset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/mappings/presets/list')
 def list_mapping_presets():
     """List available presets"""
     try:
-        presets = FileHandler.load_mapping_presets()
-
-        # Return only essential info for listing
-        preset_list = []
-        for preset in presets:
-            # Handle both old and new preset formats
-            preset_id = preset.get('id', preset.get('nome_preset', ''))
-            preset_name = preset.get('name', preset.get('nome_preset', 'Preset sem nome'))
-            preset_description = preset.get('description', '')
-            preset_created_at = preset.get('created_at', '')
-            preset_mappings = preset.get('mappings', [])
-
-            preset_list.append({
-                'id': preset_id,
-                'name': preset_name,
-                'description': preset_description,
-                'created_at': preset_created_at,
-                'mappings_count': len(preset_mappings)
-            })
+        # Only essential info for listing, cached until the presets change
+        preset_list = FileHandler.load_mapping_preset_list()
 
         return jsonify(preset_list)
 
     except Exception as e:
-        logger.error(f"Error listing presets: {str(e)}")
+        logger.exception("Error listing presets: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/mappings/presets/delete/<preset_id>', methods=['POST'])
@@ -676,7 +755,7 @@ def delete_mapping_preset(preset_id):
         return jsonify({'success': True, 'message': f'Preset "{preset_to_delete["name"]}" excluído com sucesso!'})
 
     except Exception as e:
-        logger.error(f"Error deleting preset: {str(e)}")
+        logger.exception("Error deleting preset: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/export')
@@ -687,7 +766,7 @@ def export_page():
         layouts = FileHandler.load_export_layouts()
         return render_template('export.html', transactions=transactions, layouts=layouts)
     except Exception as e:
-        logger.error(f"Error loading export page: {str(e)}")
+        logger.exception("Error loading export page: %s", e)
         return render_template('export.html', transactions=[], layouts=[])
 
 @app.route('/export/download', methods=['POST'])
@@ -699,24 +778,39 @@ def export_download():
         date_from = request.form.get('date_from', '')
         date_to = request.form.get('date_to', '')
 
-        # Load transactions
-        transactions = FileHandler.load_transactions()
+        cache_key = (_export_versions(), export_format, layout_name, date_from, date_to)
 
         # Filter by date if provided
-        if date_from:
-            transactions = [t for t in transactions if t.data >= date_from]
-        if date_to:
-            transactions = [t for t in transactions if t.data <= date_to]
+        frame = FileHandler.load_transaction_frame()
+        transactions = _date_window(frame, date_from, date_to)['transacao'].sort_index().tolist()
 
-        # Export file
+        # Build the export in memory, never through a file in exports/
         exporter = ExportManager()
-        file_path = exporter.export_transactions(transactions, export_format, layout_name)
-
-        return send_file(file_path, as_attachment=True, 
-                        download_name=f'transacoes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}')
+        chunks = exporter.stream_transactions(transactions, export_format, layout_name)
+        download_name = exporter.download_name(export_format)
+
+        # Small exports fit in one chunk: send them whole, with a Content-Length
+        if len(transactions) <= EXPORT_CHUNK_ROWS:
+            with _export_cache_lock:
+                data = _export_cache.get(cache_key)
+            if data is None:
+                data = ''.join(chunks).encode('utf-8')
+                # A save while building could mix versions; only cache data
+                # whose files did not change since the key was taken
+                if _export_versions() == cache_key[0]:
+                    with _export_cache_lock:
+                        if len(_export_cache) >= EXPORT_CACHE_SIZE:
+                            _export_cache.pop(next(iter(_export_cache)), None)
+                        _export_cache[cache_key] = data
+            return send_file(io.BytesIO(data), as_attachment=True, download_name=download_name, etag=False)
+
+        # Larger ones are streamed as they are generated
+        return Response(stream_with_context(chunks),
+                        mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename={download_name}'})
 
     except Exception as e:
-        logger.error(f"Error exporting file: {str(e)}")
+        logger.exception("Error exporting file: %s", e)
         flash(f'Erro ao exportar arquivo: {str(e)}', 'error')
         return redirect(url_for('export_page'))
 
@@ -724,6 +818,12 @@ def export_download():
 def not_found(error):
     return render_template('404.html'), 404
 
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    max_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    flash(f'Arquivo muito grande. O tamanho máximo permitido é {max_mb} MB.', 'error')
+    return redirect(request.url)
+
 @app.errorhandler(500)
 def internal_error(error):
     return render_template('500.html'), 500
\ No newline at end of file
@@ -1,28 +1,47 @@
-import os
+import io
 import csv
 import json
+import math
 import logging
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import count
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from models import Transaction
 from utils.file_handlers import FileHandler
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Rows buffered per chunk when streaming an export
+EXPORT_CHUNK_ROWS = 500
+# Numbers export downloads, so two exports in the same second never share a name
+_export_sequence = count(1)
+
+# Values column formats are tried on before compiling them
+SAMPLE_DATE = datetime(2000, 1, 1)
+SAMPLE_NUMBERS = (0, -1.5, 1e16, True, float('nan'), float('inf'))
+
 class ExportManager:
-    def __init__(self):
-        self.export_dir = 'exports'
-        os.makedirs(self.export_dir, exist_ok=True)
-    
-    def export_transactions(self, transactions: List[Transaction], format_type: str, layout_name: str = 'default') -> str:
-        """Export transactions to specified format"""
+    def stream_transactions(self, transactions: List[Transaction], format_type: str, layout_name: str = 'default') -> Iterator[str]:
+        """Export transactions to specified format as an iterator of text chunks
+        
+        The format and layout are resolved up front, so errors surface here
+        rather than halfway through a response.
+        """
         try:
             if format_type == 'csv':
-                return self._export_csv(transactions, layout_name)
+                layout = self._get_export_layout(layout_name) or self._get_default_csv_layout()
+                return self._csv_chunks(transactions, layout)
             elif format_type == 'txt':
-                return self._export_txt(transactions, layout_name)
+                layout = self._get_export_layout(layout_name) or self._get_default_txt_layout()
+                return self._txt_chunks(transactions, layout)
             elif format_type == 'json':
-                return self._export_json(transactions, layout_name)
+                return self._json_chunks(transactions)
             else:
                 raise ValueError(f"Formato de exportação não suportado: {format_type}")
         
@@ -30,99 +49,119 @@ class ExportManager:
             logger.error(f"Error exporting transactions: {str(e)}")
             raise
     
-    def _export_csv(self, transactions: List[Transaction], layout_name: str) -> str:
-        """Export transactions to CSV format"""
-        try:
-            layout = self._get_export_layout(layout_name)
-            if not layout:
-                layout = self._get_default_csv_layout()
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"transacoes_{timestamp}.csv"
-            filepath = os.path.join(self.export_dir, filename)
-            
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                # Determine delimiter
-                delimiter = layout.get('delimitador', ',')
-                writer = csv.writer(csvfile, delimiter=delimiter)
-                
-                # Write header
-                headers = [col['nome_coluna'] for col in layout['colunas']]
-                writer.writerow(headers)
-                
-                # Write data
-                for transaction in transactions:
-                    row = []
-                    for col in layout['colunas']:
-                        value = self._get_field_value(transaction, col)
-                        row.append(value)
-                    writer.writerow(row)
-            
-            return filepath
+    @staticmethod
+    def download_name(extension: str) -> str:
+        """File name for a new export download, unique even within the same second"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"transacoes_{timestamp}_{next(_export_sequence):04d}.{extension}"
+    
+    def _csv_chunks(self, transactions: List[Transaction], layout: Dict[str, Any]) -> Iterator[str]:
+        """Generate CSV text in chunks of EXPORT_CHUNK_ROWS rows"""
+        buffer = io.StringIO()
+        # Determine delimiter
+        delimiter = layout.get('delimitador', ',')
+        writer = csv.writer(buffer, delimiter=delimiter)
+        columns = layout['colunas']
         
-        except Exception as e:
-            logger.error(f"Error exporting CSV: {str(e)}")
-            raise
+        # Write header
+        headers = [col['nome_coluna'] for col in columns]
+        writer.writerow(headers)
+        
+        # Write data; chunks needing no quoting skip the csv module
+        compiled = [self._compile_column(col) for col in columns]
+        for chunk in self._chunks(transactions):
+            rows = list(self._rows(chunk, compiled))
+            text = self._plain_csv_text(rows, delimiter)
+            if text is None:
+                writer.writerows(rows)
+            else:
+                buffer.write(text)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
     
-    def _export_txt(self, transactions: List[Transaction], layout_name: str) -> str:
-        """Export transactions to TXT format"""
+    @staticmethod
+    def _plain_csv_text(rows: List[tuple], delimiter: str) -> Optional[str]:
+        """Join rows into the text csv.writer would give them, or None when a
+        cell is not a string or needs quoting (holds the delimiter, a quote or
+        a line break, or is the only, empty, cell of its row)"""
+        if not rows or len(delimiter) != 1 or delimiter in '"\r\n':
+            return None
+        width = len(rows[0])
+        if width == 0 or (width == 1 and any(row[0] == '' for row in rows)):
+            return None
+        
         try:
-            layout = self._get_export_layout(layout_name)
-            if not layout:
-                layout = self._get_default_txt_layout()
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"transacoes_{timestamp}.txt"
-            filepath = os.path.join(self.export_dir, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as txtfile:
-                delimiter = layout.get('delimitador', '|')
-                
-                for transaction in transactions:
-                    row_data = []
-                    for col in layout['colunas']:
-                        value = self._get_field_value(transaction, col)
-                        # Apply fixed width formatting if specified
-                        if col.get('tamanho_fixo'):
-                            value = self._format_fixed_width(value, col)
-                        row_data.append(str(value))
-                    
-                    line = delimiter.join(row_data)
-                    txtfile.write(line + '\n')
-            
-            return filepath
+            text = '\r\n'.join([delimiter.join(row) for row in rows]) + '\r\n'
+        except TypeError:
+            return None
         
-        except Exception as e:
-            logger.error(f"Error exporting TXT: {str(e)}")
-            raise
+        # Counting over the whole chunk finds any cell holding a special character
+        count = len(rows)
+        if (text.count(delimiter) != (width - 1) * count or text.count('\n') != count
+                or text.count('\r') != count or '"' in text):
+            return None
+        return text
     
-    def _export_json(self, transactions: List[Transaction], layout_name: str) -> str:
-        """Export transactions to JSON format"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"transacoes_{timestamp}.json"
-            filepath = os.path.join(self.export_dir, filename)
-            
-            # Convert transactions to dict format
-            data = [transaction.to_dict() for transaction in transactions]
-            
-            with open(filepath, 'w', encoding='utf-8') as jsonfile:
-                json.dump(data, jsonfile, ensure_ascii=False, indent=2)
-            
-            return filepath
+    def _txt_chunks(self, transactions: List[Transaction], layout: Dict[str, Any]) -> Iterator[str]:
+        """Generate TXT lines in chunks of EXPORT_CHUNK_ROWS rows"""
+        delimiter = layout.get('delimitador', '|')
+        cells = [self._compile_txt_cell(col) for col in layout['colunas']]
         
-        except Exception as e:
-            logger.error(f"Error exporting JSON: {str(e)}")
-            raise
+        for chunk in self._chunks(transactions):
+            yield ''.join([delimiter.join(row) + '\n' for row in self._rows(chunk, cells)])
+    
+    @staticmethod
+    def _chunks(transactions: List[Transaction]) -> Iterator[List[Transaction]]:
+        """Split transactions into slices of EXPORT_CHUNK_ROWS"""
+        for start in range(0, len(transactions), EXPORT_CHUNK_ROWS):
+            yield transactions[start:start + EXPORT_CHUNK_ROWS]
+    
+    @staticmethod
+    def _rows(chunk: List[Transaction], columns: List[Callable[[List[Transaction]], List[Any]]]) -> Iterator[tuple]:
+        """Rows of column values for a chunk, computed a column at a time"""
+        if not columns:
+            return iter([()] * len(chunk))
+        return zip(*[column(chunk) for column in columns])
+    
+    def _compile_txt_cell(self, column_config: Dict[str, Any]) -> Callable[[List[Transaction]], List[str]]:
+        """Build the function giving a column's TXT text for a chunk of transactions"""
+        column = self._compile_column(column_config)
+        fixed_width = self._compile_fixed_width(column_config)
+        
+        # Apply fixed width formatting if specified
+        if fixed_width is None:
+            return lambda chunk: list(map(str, column(chunk)))
+        return lambda chunk: [str(fixed_width(value)) for value in column(chunk)]
+    
+    def _json_chunks(self, transactions: List[Transaction]) -> Iterator[str]:
+        """Generate the JSON array with one compact transaction object per line,
+        in chunks of EXPORT_CHUNK_ROWS transactions"""
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        separator = '[\n'
+        for chunk in self._chunks(transactions):
+            lines = None
+            # orjson would write NaN values as null, unlike the stdlib encoder
+            if orjson is not None and not any(isinstance(t.valor, float) and not math.isfinite(t.valor) for t in chunk):
+                try:
+                    lines = [orjson.dumps(transaction.to_dict()).decode('utf-8') for transaction in chunk]
+                except orjson.JSONEncodeError:
+                    lines = None
+            if lines is None:
+                lines = [encoder.encode(transaction.to_dict()) for transaction in chunk]
+            
+            yield separator + ',\n'.join(lines)
+            separator = ',\n'
+        yield '\n]\n' if separator == ',\n' else '[]\n'
     
     def _get_export_layout(self, layout_name: str) -> Dict[str, Any]:
         """Get export layout by name"""
         try:
             layouts = FileHandler.load_export_layouts()
-            for layout in layouts:
-                if layout.get('nome') == layout_name:
-                    return layout
-            return None
+            return FileHandler.index_export_layouts(layouts).get(layout_name)
         
         except Exception as e:
             logger.error(f"Error getting export layout: {str(e)}")
@@ -162,6 +201,87 @@ class ExportManager:
             ]
         }
     
+    def _compile_column(self, column_config: Dict[str, Any]) -> Callable[[List[Transaction]], List[Any]]:
+        """Build the function giving a column's values for a chunk of transactions,
+        what _get_field_value would give with the configuration read only once.
+        
+        The configuration is checked here, so the compiled function runs without
+        exception handling; columns failing the checks keep the general path."""
+        def general(chunk):
+            return [self._get_field_value(transaction, column_config) for transaction in chunk]
+        
+        field_name = column_config.get('campo')
+        field_type = column_config.get('tipo', 'texto')
+        if not isinstance(field_name, str):
+            logger.error(f"Invalid export column field: {field_name!r}")
+            return general
+        
+        if field_type == 'data':
+            date_format = column_config.get('formato', '%d/%m/%Y')
+            if not self._valid_format(SAMPLE_DATE.strftime, (date_format,)):
+                return general
+            # Statements repeat dates, so each distinct one is parsed once per export
+            formatted_dates = {}
+            
+            def format_value(raw_value):
+                if isinstance(raw_value, str) and raw_value:
+                    formatted = formatted_dates.get(raw_value)
+                    if formatted is None:
+                        try:
+                            formatted = datetime.strptime(raw_value, '%Y-%m-%d').strftime(date_format)
+                        except ValueError:
+                            formatted = raw_value
+                        formatted_dates[raw_value] = formatted
+                    return formatted
+                return raw_value
+        
+        elif field_type == 'numero':
+            number_format = column_config.get('formato', '%.2f')
+            separator = column_config.get('separador_decimal', '.')
+            if not isinstance(number_format, str) or not isinstance(separator, str):
+                return general
+            if not self._valid_format(number_format.__mod__, SAMPLE_NUMBERS):
+                return general
+            
+            if separator == '.':
+                def format_value(raw_value):
+                    if isinstance(raw_value, (int, float)):
+                        return number_format % raw_value
+                    return str(raw_value)
+            else:
+                # One translate pass swaps the decimal point for the separator
+                decimal_table = str.maketrans({'.': separator})
+                
+                def format_value(raw_value):
+                    if isinstance(raw_value, (int, float)):
+                        return (number_format % raw_value).translate(decimal_table)
+                    return str(raw_value)
+        
+        else:  # texto
+            format_value = str
+        
+        # Transaction fields are read in C; anything else keeps getattr's '' default
+        if field_name in Transaction.__slots__:
+            raw_value = attrgetter(field_name)
+        else:
+            raw_value = lambda transaction: getattr(transaction, field_name, '')
+        
+        def column(chunk: List[Transaction]) -> List[Any]:
+            return list(map(format_value, map(raw_value, chunk)))
+        
+        return column
+    
+    @staticmethod
+    def _valid_format(apply: Callable[[Any], Any], samples: tuple) -> bool:
+        """Whether applying a column format to each sample succeeds"""
+        try:
+            for sample in samples:
+                apply(sample)
+        except Exception as e:
+            logger.error(f"Invalid export column format: {str(e)}")
+            return False
+        return True
+    
     def _get_field_value(self, transaction: Transaction, column_config: Dict[str, Any]) -> str:
         """Get field value based on column configuration"""
         try:
@@ -202,6 +322,38 @@ class ExportManager:
             logger.error(f"Error getting field value: {str(e)}")
             return ''
     
+    def _compile_fixed_width(self, column_config: Dict[str, Any]) -> Optional[Callable[[str], str]]:
+        """Build the fixed width formatter of a column, giving what
+        _format_fixed_width would; None when the column has no fixed width"""
+        width = column_config.get('tamanho_fixo')
+        if not width:
+            return None
+        if not isinstance(width, int):
+            # _format_fixed_width would leave every value as it is
+            logger.error(f"Invalid fixed width: {width!r}")
+            return None
+        width = int(width)
+        if width <= 0:
+            return None
+        
+        if column_config.get('preenchimento', 'spaces') == 'zeros':
+            # zfill keeps a leading sign in front of the zeros
+            def pad(value):
+                return value[:width].zfill(width)
+        else:
+            # Truncates and pads with spaces in a single format call
+            spec = f'<{width}.{width}'
+            
+            def pad(value):
+                return format(value, spec)
+        
+        def fixed_width(value: str) -> str:
+            if isinstance(value, str):
+                return pad(value)
+            return self._format_fixed_width(value, column_config)
+        
+        return fixed_width
+    
     def _format_fixed_width(self, value: str, column_config: Dict[str, Any]) -> str:
         """Format value with fixed width"""
         try:
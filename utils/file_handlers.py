@@ -1,50 +1,464 @@
 import os
+import heapq
 import json
+import math
+import mmap
 import logging
-from typing import List, Dict, Any
+import threading
+import pandas as pd
+from operator import attrgetter
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from models import Transaction, BankTemplate, AccountingMapping, CustomRule
 
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library json module
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # Preset listings and large transaction files are then parsed whole
+    ijson = None
+
 logger = logging.getLogger(__name__)
 
+# Parsed data per file path, reused until the file's version token changes
+_cache: Dict[str, Tuple[Any, Any]] = {}
+# Serializes reads and writes of the transactions file across request threads
+_transactions_lock = threading.RLock()
+# Files from this size are parsed from a memory map rather than read into memory
+MMAP_MIN_SIZE = 1 << 20
+# Transaction files from this size are streamed with ijson, one transaction at a
+# time, so the whole document is never held in memory next to the Transactions
+STREAM_MIN_SIZE = 50 << 20
+# Transactions and presets are only read by the app, so they are written compact
+# unless DEBUG_JSON is set; configuration files stay indented for hand editing
+INDENT_DATA_FILES = bool(os.environ.get('DEBUG_JSON'))
+
+
+def _file_token(filepath: str) -> Optional[Tuple[int, int]]:
+    """Identify the current version of a file by mtime and size"""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _json_entries(dirpath: str) -> List[os.DirEntry]:
+    """The JSON files of a directory, in directory order, from a single scan"""
+    with os.scandir(dirpath) as entries:
+        return [entry for entry in entries if entry.name.endswith('.json')]
+
+
+def _entry_token(entry: os.DirEntry) -> Optional[Tuple[int, int]]:
+    """_file_token for a scanned directory entry"""
+    try:
+        stat = entry.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _dir_token(dirpath: str, entries: Optional[List[os.DirEntry]] = None) -> Tuple:
+    """Identify the current version of the JSON files in a directory"""
+    if entries is None:
+        entries = _json_entries(dirpath)
+    return tuple(sorted((entry.name, _entry_token(entry)) for entry in entries))
+
+
+def _cache_get(filepath: str, token: Any) -> Optional[Any]:
+    entry = _cache.get(filepath)
+    if entry is not None and entry[0] == token:
+        return entry[1]
+    return None
+
+
+def _cache_put(filepath: str, token: Any, data: Any) -> None:
+    _cache[filepath] = (token, data)
+
+
+def _cache_invalidate(filepath: str) -> None:
+    _cache.pop(filepath, None)
+
+
+def _read_json(filepath: str) -> Any:
+    """Parse a JSON file, with orjson when it is installed"""
+    with open(filepath, 'rb') as f:
+        if orjson is not None:
+            try:
+                if os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+                    # Parsed straight from the mapped pages, without a bytes copy of the file
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                        return orjson.loads(view)
+                return orjson.loads(f.read())
+            except orjson.JSONDecodeError:
+                # Older files may hold NaN/Infinity, which only the stdlib accepts
+                f.seek(0)
+        return json.loads(f.read())
+
+
+def _dump_json(data: Any, default: Any = None, use_orjson: bool = True, indent: bool = True) -> bytes:
+    """Serialize data as JSON, indented by 2 or compact, byte-identical with or without orjson"""
+    payload = None
+    if orjson is not None and use_orjson:
+        try:
+            payload = orjson.dumps(data, default=default, option=orjson.OPT_INDENT_2 if indent else None)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib still handles
+            payload = None
+    if payload is None:
+        if indent:
+            text = json.dumps(data, default=default, ensure_ascii=False, indent=2)
+        else:
+            text = json.dumps(data, default=default, ensure_ascii=False, separators=(',', ':'))
+        payload = text.encode('utf-8')
+    return payload
+
+
+def _write_json(filepath: str, data: Any, default: Any = None, use_orjson: bool = True, indent: bool = True) -> None:
+    """Write data as JSON, indented by 2 unless indent is False.
+    
+    The file is written beside the target and moved over it with os.replace,
+    so readers and crashes see either the old or the new file, never a part.
+    """
+    payload = _dump_json(data, default=default, use_orjson=use_orjson, indent=indent)
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, filepath)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _append_json_items(filepath: str, items: List[Any], default: Any = None,
+                       use_orjson: bool = True, indent: bool = True) -> bool:
+    """Write items over the closing bracket of the JSON array in filepath.
+    
+    Only done when the array is non-empty and laid out as _write_json writes
+    it, so the file ends up byte-identical to a full rewrite. Returns whether
+    the items were appended. If the write fails part-way, the closing bracket
+    is put back and the file cut to its old size before the error is raised.
+    """
+    payload = _dump_json(items, default=default, use_orjson=use_orjson, indent=indent)
+    # The closing bracket, on its own line when indented
+    closing = b'\n]' if indent else b']'
+    if not payload.startswith(b'[\n' if indent else b'[') or payload == b'[]':
+        return False
+    
+    # Unbuffered, so a failed write leaves nothing pending to flush over the restore
+    with open(filepath, 'r+b', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= len(closing) + 1:
+            return False
+        # One byte more than the bracket, to tell "[]" apart from a last item
+        f.seek(-len(closing) - 1, os.SEEK_END)
+        tail = f.read()
+        if not tail.endswith(closing) or tail.startswith(b'['):
+            return False
+        # "...}\n]" becomes "...},\n  {...}\n]", or "...}]" becomes "...},{...}]"
+        end = size - len(closing)
+        try:
+            f.seek(end)
+            pending = memoryview(b',' + payload[1:])
+            while pending:
+                pending = pending[f.write(pending):]
+        except BaseException:
+            # e.g. a full disk: restore the array as it was
+            f.seek(end)
+            f.write(closing)
+            f.truncate(size)
+            raise
+    return True
+
+
+def _has_finite_values(transactions: List[Transaction]) -> bool:
+    """Whether orjson can write the transactions (it would turn NaN values into null)"""
+    return not any(isinstance(t.valor, float) and not math.isfinite(t.valor) for t in transactions)
+
+
+# Transaction fields in to_dict() order, read straight from the slots
+_TRANSACTION_FIELDS = Transaction.__slots__
+
+
+def _transaction_default(obj: Any) -> Dict[str, Any]:
+    """JSON default hook serializing Transaction objects without to_dict()"""
+    if isinstance(obj, Transaction):
+        return {field: getattr(obj, field) for field in _TRANSACTION_FIELDS}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_JSON_SCALAR_EVENTS = frozenset(('null', 'boolean', 'integer', 'double', 'number', 'string'))
+
+
+def _stream_preset_fields(filepath: str) -> List[Dict[str, Any]]:
+    """Read the top-level scalar fields of each preset with ijson.
+    
+    Mappings are counted as they stream past instead of being built, so
+    'mappings' holds the number of mappings rather than the list itself.
+    """
+    presets = []
+    current = None
+    with open(filepath, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix == 'item':
+                if event == 'start_map':
+                    current = {}
+                    presets.append(current)
+            elif prefix == 'item.mappings':
+                if event == 'start_array':
+                    current['mappings'] = 0
+            elif prefix == 'item.mappings.item':
+                if event in _JSON_SCALAR_EVENTS or event in ('start_map', 'start_array'):
+                    current['mappings'] += 1
+            elif event in _JSON_SCALAR_EVENTS and prefix.count('.') == 1:
+                current[prefix[5:]] = value
+    return presets
+
+
+def _template_id(template: BankTemplate) -> str:
+    """Identifier of a bank template, also the name of its file"""
+    return template.banco.lower().replace(' ', '_')
+
+
+def _derive_items(path: str, token: Any, items: List[Any], name: str, build: Callable[[List[Any]], Any]) -> Any:
+    """Compute build(items), reused while items is the cached list for path"""
+    derived_key = f"{path}#{name}"
+    entry = _cache.get(derived_key)
+    if entry is not None and entry[0] is items:
+        return entry[1]
+    
+    derived = build(items)
+    if _cache_get(path, token) is items:
+        _cache_put(derived_key, items, derived)
+    return derived
+
+
+def _index_items(path: str, token: Any, items: List[Any], name: str, key: Callable[[Any], str]) -> Dict[str, Any]:
+    """Map key(item) to items, reused while items is the cached list for path"""
+    # Reversed so the first item wins on duplicate keys, as a linear scan would
+    return _derive_items(path, token, items, name,
+                         lambda items: {key(item): item for item in reversed(items)})
+
+
+def _group_by_description(transactions: List[Transaction]) -> Dict[str, List[Transaction]]:
+    groups: Dict[str, List[Transaction]] = {}
+    for transaction in transactions:
+        groups.setdefault(transaction.descricao_normalizada, []).append(transaction)
+    return groups
+
+
+def _index_by_id(filepath: str, items: List[Any]) -> Dict[str, Any]:
+    """Map ids to items, reused while items is the cached list for filepath"""
+    return _index_items(filepath, _file_token(filepath), items, 'by_id', attrgetter('id'))
+
+
+def _invalidate_transactions(filepath: str) -> None:
+    """Drop the cached transactions file and everything derived from it"""
+    _cache_invalidate(filepath)
+    for name in ('stats', 'frame', 'by_id', 'by_description'):
+        _cache_invalidate(f"{filepath}#{name}")
+
+
+def _read_transactions(filepath: str) -> List[Transaction]:
+    """Transactions stored in filepath, cached per file version.
+    
+    A missing or empty file holds no transactions; any other file that
+    cannot be read raises. Callers hold _transactions_lock.
+    """
+    token = _file_token(filepath)
+    if token is None or token[1] == 0:
+        return []
+    
+    cached = _cache_get(filepath, token)
+    if cached is not None:
+        return cached
+    
+    transactions = None
+    if ijson is not None and token[1] >= STREAM_MIN_SIZE:
+        try:
+            with open(filepath, 'rb') as f:
+                transactions = [Transaction.from_dict(item) for item in ijson.items(f, 'item', use_float=True)]
+        except ijson.JSONError:
+            # e.g. NaN/Infinity from older files, which only the stdlib accepts
+            transactions = None
+    
+    if transactions is None:
+        data = _read_json(filepath)
+        
+        transactions = [Transaction.from_dict(item) for item in data]
+    
+    _cache_put(filepath, token, transactions)
+    return transactions
+
+
 class FileHandler:
+    @staticmethod
+    def file_version(filepath: str) -> Optional[Tuple[int, int]]:
+        """Version of a data file (mtime and size), None when it is missing"""
+        return _file_token(filepath)
+    
+    @staticmethod
+    def transactions_lock() -> threading.RLock:
+        """Lock to hold from loading transactions through saving changes to
+        them, so concurrent edits cannot overwrite one another.
+        
+        Loaded transactions are the shared cached objects: edits go to copies,
+        and the saved list becomes the new cached one.
+        """
+        return _transactions_lock
+    
     @staticmethod
     def load_transactions() -> List[Transaction]:
         """Load transactions from JSON file"""
         try:
             filepath = 'data/transacoes.json'
-            if not os.path.exists(filepath):
-                return []
-            
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # A cached list is returned without waiting for an edit in progress
+            token = _file_token(filepath)
+            cached = _cache_get(filepath, token) if token is not None else None
+            if cached is not None:
+                return cached
             
-            transactions = []
-            for item in data:
-                transaction = Transaction.from_dict(item)
-                transactions.append(transaction)
-            
-            return transactions
+            with _transactions_lock:
+                return _read_transactions(filepath)
         
         except Exception as e:
             logger.error(f"Error loading transactions: {str(e)}")
             return []
     
+    @staticmethod
+    def load_transaction_stats() -> Dict[str, Any]:
+        """Dashboard summary (total, mapped and the five most recent transactions),
+        cached with the transactions file"""
+        filepath = 'data/transacoes.json'
+        stats_key = f"{filepath}#stats"
+        token = _file_token(filepath)
+        
+        cached = _cache_get(stats_key, token)
+        if cached is not None:
+            return cached
+        
+        transactions = FileHandler.load_transactions()
+        stats = {
+            'total': len(transactions),
+            'mapped': sum(1 for t in transactions if t.rotulo_contabil),
+            'recent': heapq.nlargest(5, transactions, key=attrgetter('data'))
+        }
+        
+        # Only keep counts taken from this exact version of the file
+        if _cache_get(filepath, token) is transactions:
+            _cache_put(stats_key, token, stats)
+        return stats
+    
+    @staticmethod
+    def load_transaction_frame() -> pd.DataFrame:
+        """Columnar view of the transactions for vectorized filtering.
+        
+        Rows are sorted newest first (ties in file order) and indexed by file
+        position; the 'transacao' column holds the Transaction objects, so
+        filtered rows map straight back to them. 'situacao' classifies each
+        row as 'mapped', 'unmapped' or 'ignored' and 'banco' is categorical,
+        so common filters are a single comparison.
+        """
+        filepath = 'data/transacoes.json'
+        frame_key = f"{filepath}#frame"
+        token = _file_token(filepath)
+        
+        cached = _cache_get(frame_key, token)
+        if cached is not None:
+            return cached
+        
+        transactions = FileHandler.load_transactions()
+        frame = pd.DataFrame({
+            'id': [t.id for t in transactions],
+            'data': [t.data for t in transactions],
+            'banco': [t.banco for t in transactions],
+            'valor': [t.valor for t in transactions],
+            'rotulo_contabil': [t.rotulo_contabil or '' for t in transactions],
+            'revisado_manualmente': [t.revisado_manualmente for t in transactions],
+            'descricao_normalizada': [t.descricao_normalizada for t in transactions],
+            'transacao': transactions,
+        }, dtype=object)
+        frame['banco'] = frame['banco'].astype('category')
+        frame['situacao'] = pd.Categorical(
+            ['ignored' if r == 'IGNORAR' else 'mapped' if r else 'unmapped' for r in frame['rotulo_contabil']],
+            categories=['mapped', 'unmapped', 'ignored']
+        )
+        frame = frame.sort_values('data', ascending=False, kind='stable')
+        
+        if _cache_get(filepath, token) is transactions:
+            _cache_put(frame_key, token, frame)
+        return frame
+    
+    @staticmethod
+    def index_transactions(transactions: List[Transaction]) -> Dict[str, Transaction]:
+        """Transactions by id, cached along with the loaded list"""
+        return _index_by_id('data/transacoes.json', transactions)
+    
+    @staticmethod
+    def group_transactions_by_description(transactions: List[Transaction]) -> Dict[str, List[Transaction]]:
+        """Transactions grouped by normalized description in file order,
+        cached along with the loaded list"""
+        filepath = 'data/transacoes.json'
+        return _derive_items(filepath, _file_token(filepath), transactions, 'by_description', _group_by_description)
+    
     @staticmethod
     def save_transactions(transactions: List[Transaction]) -> None:
         """Save transactions to JSON file"""
         try:
             filepath = 'data/transacoes.json'
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            
-            data = [transaction.to_dict() for transaction in transactions]
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with _transactions_lock:
+                _invalidate_transactions(filepath)
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                
+                # NaN values (e.g. from blank CSV cells) need the stdlib encoder
+                finite = _has_finite_values(transactions)
+                _write_json(filepath, transactions, default=_transaction_default, use_orjson=finite,
+                            indent=INDENT_DATA_FILES)
+                
+                # The saved objects become the cached copy, so the next read skips parsing
+                _cache_put(filepath, _file_token(filepath), list(transactions))
         
         except Exception as e:
             logger.error(f"Error saving transactions: {str(e)}")
             raise
     
+    @staticmethod
+    def append_transactions(transactions: List[Transaction]) -> None:
+        """Add transactions to the end of the JSON file.
+        
+        Only the new transactions are serialized; they are written over the
+        closing bracket of the stored array. Falls back to save_transactions
+        when the file is empty, missing or not in the format it writes. A file
+        that exists but cannot be read raises instead, since rewriting it with
+        only the new transactions would lose the stored ones.
+        """
+        try:
+            filepath = 'data/transacoes.json'
+            with _transactions_lock:
+                existing = _read_transactions(filepath)
+                token = _file_token(filepath)
+                if not existing or _cache_get(filepath, token) is not existing:
+                    FileHandler.save_transactions(existing + transactions)
+                    return
+                
+                _invalidate_transactions(filepath)
+                if not _append_json_items(filepath, transactions, default=_transaction_default,
+                                          use_orjson=_has_finite_values(transactions),
+                                          indent=INDENT_DATA_FILES):
+                    FileHandler.save_transactions(existing + transactions)
+                    return
+                
+                existing.extend(transactions)
+                _cache_put(filepath, _file_token(filepath), existing)
+        
+        except Exception as e:
+            logger.error(f"Error appending transactions: {str(e)}")
+            raise
+    
     @staticmethod
     def load_bank_templates() -> List[BankTemplate]:
         """Load bank templates from template files"""
@@ -55,38 +469,62 @@ class FileHandler:
             if not os.path.exists(template_dir):
                 return templates
             
-            for filename in os.listdir(template_dir):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(template_dir, filename)
-                    try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        template = BankTemplate.from_dict(data)
-                        templates.append(template)
+            # One directory scan serves both the version check and the loading
+            entries = _json_entries(template_dir)
+            token = _dir_token(template_dir, entries)
+            cached = _cache_get(template_dir, token)
+            if cached is not None:
+                return cached
+            
+            for entry in entries:
+                try:
+                    data = _read_json(entry.path)
                     
-                    except Exception as e:
-                        logger.error(f"Error loading template {filename}: {str(e)}")
-                        continue
+                    template = BankTemplate.from_dict(data)
+                    templates.append(template)
+                
+                except Exception as e:
+                    logger.error(f"Error loading template {entry.name}: {str(e)}")
+                    continue
             
+            _cache_put(template_dir, token, templates)
             return templates
         
         except Exception as e:
             logger.error(f"Error loading bank templates: {str(e)}")
             return []
     
+    @staticmethod
+    def index_bank_templates(templates: List[BankTemplate]) -> Dict[str, BankTemplate]:
+        """Bank templates by template id, cached along with the loaded list"""
+        template_dir = 'data/templates'
+        if not os.path.exists(template_dir):
+            return {}
+        return _index_items(template_dir, _dir_token(template_dir), templates, 'by_template_id', _template_id)
+    
+    @staticmethod
+    def index_bank_templates_by_bank(templates: List[BankTemplate]) -> Dict[str, BankTemplate]:
+        """Bank templates by lowercased bank name, cached along with the loaded list"""
+        template_dir = 'data/templates'
+        if not os.path.exists(template_dir):
+            return {}
+        return _index_items(template_dir, _dir_token(template_dir), templates, 'by_bank',
+                            lambda template: template.banco.lower())
+    
     @staticmethod
     def save_bank_template(template: BankTemplate) -> None:
         """Save bank template to file"""
         try:
             template_dir = 'data/templates'
+            _cache_invalidate(template_dir)
+            _cache_invalidate(f"{template_dir}#by_template_id")
+            _cache_invalidate(f"{template_dir}#by_bank")
             os.makedirs(template_dir, exist_ok=True)
             
-            filename = f"{template.banco.lower().replace(' ', '_')}.json"
+            filename = f"{_template_id(template)}.json"
             filepath = os.path.join(template_dir, filename)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(template.to_dict(), f, ensure_ascii=False, indent=2)
+            _write_json(filepath, template.to_dict())
         
         except Exception as e:
             logger.error(f"Error saving bank template: {str(e)}")
@@ -97,6 +535,9 @@ class FileHandler:
         """Delete bank template file"""
         try:
             template_dir = 'data/templates'
+            _cache_invalidate(template_dir)
+            _cache_invalidate(f"{template_dir}#by_template_id")
+            _cache_invalidate(f"{template_dir}#by_bank")
             filename = f"{template_id}.json"
             filepath = os.path.join(template_dir, filename)
             
@@ -112,34 +553,45 @@ class FileHandler:
         """Load accounting mappings from JSON file"""
         try:
             filepath = 'data/mapeamentos_contabeis.json'
-            if not os.path.exists(filepath):
+            token = _file_token(filepath)
+            if token is None:
                 return []
             
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            cached = _cache_get(filepath, token)
+            if cached is not None:
+                return cached
+            
+            data = _read_json(filepath)
             
             mappings = []
             for item in data:
                 mapping = AccountingMapping.from_dict(item)
                 mappings.append(mapping)
             
+            _cache_put(filepath, token, mappings)
             return mappings
         
         except Exception as e:
             logger.error(f"Error loading accounting mappings: {str(e)}")
             return []
     
+    @staticmethod
+    def index_accounting_mappings(mappings: List[AccountingMapping]) -> Dict[str, AccountingMapping]:
+        """Accounting mappings by id, cached along with the loaded list"""
+        return _index_by_id('data/mapeamentos_contabeis.json', mappings)
+    
     @staticmethod
     def save_accounting_mappings(mappings: List[AccountingMapping]) -> None:
         """Save accounting mappings to JSON file"""
         try:
             filepath = 'data/mapeamentos_contabeis.json'
+            _cache_invalidate(filepath)
+            _cache_invalidate(f"{filepath}#by_id")
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
             data = [mapping.to_dict() for mapping in mappings]
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            _write_json(filepath, data)
         
         except Exception as e:
             logger.error(f"Error saving accounting mappings: {str(e)}")
@@ -150,17 +602,22 @@ class FileHandler:
         """Load custom rules from JSON file"""
         try:
             filepath = 'data/regras_personalizadas.json'
-            if not os.path.exists(filepath):
+            token = _file_token(filepath)
+            if token is None:
                 return []
             
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            cached = _cache_get(filepath, token)
+            if cached is not None:
+                return cached
+            
+            data = _read_json(filepath)
             
             rules = []
             for item in data:
                 rule = CustomRule.from_dict(item)
                 rules.append(rule)
             
+            _cache_put(filepath, token, rules)
             return rules
         
         except Exception as e:
@@ -172,12 +629,12 @@ class FileHandler:
         """Save custom rules to JSON file"""
         try:
             filepath = 'data/regras_personalizadas.json'
+            _cache_invalidate(filepath)
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
             data = [rule.to_dict() for rule in rules]
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            _write_json(filepath, data)
         
         except Exception as e:
             logger.error(f"Error saving custom rules: {str(e)}")
@@ -188,58 +645,139 @@ class FileHandler:
         """Load mapping presets from JSON file"""
         try:
             filepath = 'data/presets_mapeamentos.json'
-            if not os.path.exists(filepath):
+            token = _file_token(filepath)
+            if token is None:
                 return []
             
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            cached = _cache_get(filepath, token)
+            if cached is not None:
+                return cached
+            
+            data = _read_json(filepath)
             
+            _cache_put(filepath, token, data)
             return data
         
         except Exception as e:
             logger.error(f"Error loading mapping presets: {str(e)}")
             return []
     
+    @staticmethod
+    def load_mapping_preset_list() -> List[Dict[str, Any]]:
+        """Summaries of the mapping presets for listing, cached with the presets file"""
+        filepath = 'data/presets_mapeamentos.json'
+        list_key = f"{filepath}#list"
+        token = _file_token(filepath)
+        
+        cached = _cache_get(list_key, token)
+        if cached is not None:
+            return cached
+        
+        presets = _cache_get(filepath, token)
+        streamed = presets is None and token is not None and ijson is not None
+        if streamed:
+            # Skip materializing every preset's mappings just to count them
+            try:
+                presets = _stream_preset_fields(filepath)
+            except ijson.JSONError:
+                streamed = False
+        if not streamed:
+            presets = FileHandler.load_mapping_presets()
+        
+        preset_list = []
+        for preset in presets:
+            # Handle both old and new preset formats
+            preset_list.append({
+                'id': preset.get('id', preset.get('nome_preset', '')),
+                'name': preset.get('name', preset.get('nome_preset', 'Preset sem nome')),
+                'description': preset.get('description', ''),
+                'created_at': preset.get('created_at', ''),
+                'mappings_count': preset.get('mappings', 0) if streamed else len(preset.get('mappings', []))
+            })
+        
+        if streamed:
+            current = _file_token(filepath) == token
+        else:
+            current = _cache_get(filepath, token) is presets
+        if current:
+            _cache_put(list_key, token, preset_list)
+        return preset_list
+    
     @staticmethod
     def save_mapping_presets(presets: List[Dict[str, Any]]) -> None:
         """Save mapping presets to JSON file"""
         try:
             filepath = 'data/presets_mapeamentos.json'
+            _cache_invalidate(filepath)
+            _cache_invalidate(f"{filepath}#list")
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(presets, f, ensure_ascii=False, indent=2)
+            _write_json(filepath, presets, indent=INDENT_DATA_FILES)
         
         except Exception as e:
             logger.error(f"Error saving mapping presets: {str(e)}")
             raise
     
+    @staticmethod
+    def append_mapping_preset(preset: Dict[str, Any]) -> None:
+        """Add a preset to the end of the presets file, serializing only that
+        preset when the file allows it (see append_transactions)"""
+        try:
+            filepath = 'data/presets_mapeamentos.json'
+            presets = FileHandler.load_mapping_presets()
+            token = _file_token(filepath)
+            if presets and _cache_get(filepath, token) is presets:
+                _cache_invalidate(filepath)
+                _cache_invalidate(f"{filepath}#list")
+                if _append_json_items(filepath, [preset], indent=INDENT_DATA_FILES):
+                    presets.append(preset)
+                    _cache_put(filepath, _file_token(filepath), presets)
+                    return
+            
+            FileHandler.save_mapping_presets(presets + [preset])
+        
+        except Exception as e:
+            logger.error(f"Error appending mapping preset: {str(e)}")
+            raise
+    
     @staticmethod
     def load_export_layouts() -> List[Dict[str, Any]]:
         """Load export layouts from JSON file"""
         try:
             filepath = 'data/layouts_exportacao.json'
-            if not os.path.exists(filepath):
+            token = _file_token(filepath)
+            if token is None:
                 return []
             
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            cached = _cache_get(filepath, token)
+            if cached is not None:
+                return cached
             
+            data = _read_json(filepath)
+            
+            _cache_put(filepath, token, data)
             return data
         
         except Exception as e:
             logger.error(f"Error loading export layouts: {str(e)}")
             return []
     
+    @staticmethod
+    def index_export_layouts(layouts: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Export layouts by name, cached along with the loaded list"""
+        filepath = 'data/layouts_exportacao.json'
+        return _index_items(filepath, _file_token(filepath), layouts, 'by_name', lambda layout: layout.get('nome'))
+    
     @staticmethod
     def save_export_layouts(layouts: List[Dict[str, Any]]) -> None:
         """Save export layouts to JSON file"""
         try:
             filepath = 'data/layouts_exportacao.json'
+            _cache_invalidate(filepath)
+            _cache_invalidate(f"{filepath}#by_name")
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(layouts, f, ensure_ascii=False, indent=2)
+            _write_json(filepath, layouts)
         
         except Exception as e:
             logger.error(f"Error saving export layouts: {str(e)}")
@@ -1,17 +1,120 @@
 import os
 import re
 import logging
+import calendar
 import pandas as pd
 from datetime import datetime
-from typing import List, Optional
+from concurrent.futures import Executor
+from typing import Callable, List, Optional
 from models import Transaction, BankTemplate
 from utils.file_handlers import FileHandler
 
+# PDF, OCR and OFX libraries are optional; the methods needing a missing one
+# report it (or fall back) when called
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    import pymupdf as fitz  # PyMuPDF, under its historical name
+except ImportError:
+    fitz = None
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:
+    pytesseract = Image = None
+
+try:
+    from ofxparse import OfxParser
+except ImportError:
+    OfxParser = None
+
 logger = logging.getLogger(__name__)
 
+# Description patterns matching any line without a newline entirely
+WHOLE_LINE_PATTERNS = frozenset((r'.+', r'.*'))
+# Date patterns whose every match contains a slash
+SLASH_DATE_PATTERNS = frozenset((
+    r'\d{2}/\d{2}/\d{4}', r'\d{2}/\d{2}/\d{2}', r'\d{2}/\d{2}',
+    r'\d{1,2}/\d{1,2}/\d{4}', r'\d{1,2}/\d{1,2}/\d{2,4}', r'[0-9]{2}/[0-9]{2}/[0-9]{4}',
+))
+# Below this many pages a PDF is read in-process rather than split across workers
+PARALLEL_PDF_MIN_PAGES = 4
+# Plain dd/mm/yyyy dates, which are rearranged without strptime
+_BR_DATE_RE = re.compile(r'([0-9]{2})/([0-9]{2})/([1-9][0-9]{3})')
+
+
+def _br_date_to_iso(date_str: str) -> str:
+    """Convert a '%d/%m/%Y' date to '%Y-%m-%d', raising like strptime on invalid dates"""
+    match = _BR_DATE_RE.fullmatch(date_str) if isinstance(date_str, str) else None
+    if match:
+        day, month, year = match.groups()
+        if 1 <= int(month) <= 12 and 1 <= int(day) <= calendar.monthrange(int(year), int(month))[1]:
+            return f"{year}-{month}-{day}"
+    # Anything else (single digits, other digit sets, invalid days) is left to strptime
+    return datetime.strptime(date_str, '%d/%m/%Y').strftime('%Y-%m-%d')
+
+
+def _pdfplumber_page_texts(pdf, page_numbers: range) -> List[Optional[str]]:
+    """Text of the given pages of a PDF opened with pdfplumber.
+    
+    Module-level so page ranges can be extracted in worker processes.
+    """
+    texts = []
+    pages = pdf.pages
+    for page_num in page_numbers:
+        page = pages[page_num]
+        try:
+            texts.append(page.extract_text())
+        finally:
+            # pdfplumber keeps each page's parsed objects until flushed
+            page.close()
+    return texts
+
+
+def _ocr_page_texts(doc, page_numbers: range) -> List[str]:
+    """OCR text of the given pages of a PDF opened with PyMuPDF.
+    
+    Module-level so page ranges can be recognized in worker processes.
+    """
+    texts = []
+    for page_num in page_numbers:
+        # Rendered in grayscale, which tesseract reduces color pages to anyway
+        pix = doc.load_page(page_num).get_pixmap(colorspace=fitz.csGRAY, alpha=False)
+        
+        # Wrap the samples as a PIL Image directly, without an encoded copy,
+        # and apply OCR, releasing the image before the next page
+        with Image.frombytes("L", (pix.width, pix.height), pix.samples) as img:
+            texts.append(pytesseract.image_to_string(img, lang='por'))
+        del pix
+    return texts
+
+
+def _read_pages_in_worker(open_document: Callable, read_pages: Callable[..., List[Optional[str]]],
+                          filepath: str, page_numbers: range) -> List[Optional[str]]:
+    """Open a PDF and read a range of its pages in a worker process. Errors
+    come back as RuntimeError, since library exceptions that fail to
+    unpickle in the parent would break the whole pool"""
+    try:
+        with open_document(filepath) as document:
+            return read_pages(document, page_numbers)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {str(e)}") from None
+
+
+def _pdfplumber_page_count(pdf) -> int:
+    return len(pdf.pages)
+
+
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self, executor: Optional[Executor] = None, workers: int = 1):
         self.supported_formats = ['pdf', 'csv', 'ofx']
+        # Worker processes long PDFs are split across, one page range per worker
+        self.executor = executor
+        self.workers = workers
     
     def process_file(self, filepath: str, bank_template: str = 'auto') -> List[Transaction]:
         """Process a file based on its format"""
@@ -74,95 +177,95 @@ class PDFProcessor:
     
     def _extract_text_from_pdf(self, filepath: str, template: BankTemplate) -> List[Transaction]:
         """Extract text directly from PDF using pdfplumber"""
+        if pdfplumber is None:
+            logger.warning("pdfplumber not available, trying PyMuPDF")
+            return self._extract_text_with_pymupdf(filepath, template)
+        
         try:
-            import pdfplumber
-            
             transactions = []
-            with pdfplumber.open(filepath) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        page_transactions = self._parse_text_with_template(text, template)
-                        transactions.extend(page_transactions)
+            for text in self._page_texts(pdfplumber.open, _pdfplumber_page_count, _pdfplumber_page_texts, filepath):
+                if text:
+                    page_transactions = self._parse_text_with_template(text, template)
+                    transactions.extend(page_transactions)
             
             return transactions
         
-        except ImportError:
-            logger.warning("pdfplumber not available, trying PyMuPDF")
-            return self._extract_text_with_pymupdf(filepath, template)
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise
     
+    def _page_texts(self, open_document: Callable, count_pages: Callable[..., int],
+                    read_pages: Callable[..., List[Optional[str]]], filepath: str) -> List[Optional[str]]:
+        """Page texts in page order. PDFs with at least PARALLEL_PDF_MIN_PAGES
+        pages are split by page range across the executor's workers; shorter
+        ones are read from the same open that counted their pages"""
+        with open_document(filepath) as document:
+            page_count = count_pages(document)
+            if self.executor is None or self.workers < 2 or page_count < PARALLEL_PDF_MIN_PAGES:
+                return read_pages(document, range(page_count))
+        
+        size = -(-page_count // self.workers)
+        ranges = [range(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+        results = self.executor.map(_read_pages_in_worker, [open_document] * len(ranges),
+                                    [read_pages] * len(ranges), [filepath] * len(ranges), ranges)
+        return [text for texts in results for text in texts]
+    
     def _extract_text_with_pymupdf(self, filepath: str, template: BankTemplate) -> List[Transaction]:
         """Extract text using PyMuPDF as fallback"""
+        if fitz is None:
+            logger.error("PyMuPDF not available")
+            raise Exception("Bibliotecas de processamento PDF não disponíveis")
+        
         try:
-            import fitz  # PyMuPDF
-            
             transactions = []
-            doc = fitz.open(filepath)
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                if text:
-                    page_transactions = self._parse_text_with_template(text, template)
-                    transactions.extend(page_transactions)
+            with fitz.open(filepath) as doc:
+                for page in doc:
+                    text = page.get_text()
+                    if text:
+                        page_transactions = self._parse_text_with_template(text, template)
+                        transactions.extend(page_transactions)
             
-            doc.close()
             return transactions
         
-        except ImportError:
-            logger.error("PyMuPDF not available")
-            raise Exception("Bibliotecas de processamento PDF não disponíveis")
         except Exception as e:
             logger.error(f"Error extracting text with PyMuPDF: {str(e)}")
             raise
     
     def _extract_text_with_ocr(self, filepath: str, template: BankTemplate) -> List[Transaction]:
         """Extract text using OCR with pytesseract"""
+        if pytesseract is None or fitz is None:
+            logger.error("pytesseract or PIL not available")
+            raise Exception("Bibliotecas de OCR não disponíveis")
+        
         try:
-            import pytesseract
-            from PIL import Image
-            import fitz  # PyMuPDF for PDF to image conversion
-            
             transactions = []
             
-            # Convert PDF to images
-            doc = fitz.open(filepath)
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                pix = page.get_pixmap()
-                img_data = pix.tobytes("ppm")
-                
-                # Convert to PIL Image
-                img = Image.open(io.BytesIO(img_data))
-                
-                # Apply OCR
-                text = pytesseract.image_to_string(img, lang='por')
+            # Convert PDF pages to images and apply OCR
+            for text in self._page_texts(fitz.open, len, _ocr_page_texts, filepath):
                 if text:
                     page_transactions = self._parse_text_with_template(text, template)
                     transactions.extend(page_transactions)
             
-            doc.close()
             return transactions
         
-        except ImportError:
-            logger.error("pytesseract or PIL not available")
-            raise Exception("Bibliotecas de OCR não disponíveis")
         except Exception as e:
             logger.error(f"Error extracting text with OCR: {str(e)}")
             raise
     
     def _convert_pdf_to_csv_heuristic(self, filepath: str, template: BankTemplate) -> List[Transaction]:
         """Convert PDF to CSV using heuristic table detection"""
+        if pdfplumber is None:
+            logger.error("pdfplumber not available for table extraction")
+            raise Exception("Biblioteca de extração de tabelas não disponível")
+        
         try:
-            import pdfplumber
-            
             transactions = []
             with pdfplumber.open(filepath) as pdf:
                 for page in pdf.pages:
-                    tables = page.extract_tables()
+                    try:
+                        tables = page.extract_tables()
+                    finally:
+                        page.close()
                     for table in tables:
                         if table:
                             table_transactions = self._parse_table_with_template(table, template)
@@ -170,9 +273,6 @@ class PDFProcessor:
             
             return transactions
         
-        except ImportError:
-            logger.error("pdfplumber not available for table extraction")
-            raise Exception("Biblioteca de extração de tabelas não disponível")
         except Exception as e:
             logger.error(f"Error converting PDF to CSV heuristic: {str(e)}")
             raise
@@ -189,34 +289,51 @@ class PDFProcessor:
             end_line = len(lines) - template.linhas_ignoradas_rodape
             lines = lines[start_line:end_line]
             
+            # Compiled once per template instead of looked up per line
+            re_data = template.compiled_data
+            re_valor = template.compiled_valor
+            re_descricao = template.compiled_descricao
+            # A description pattern matching any whole line strips every line
+            # to nothing, which then falls back to the line itself
+            whole_line = template.regex_descricao in WHOLE_LINE_PATTERNS
+            # Dates like dd/mm/yyyy cannot match lines without a slash
+            needs_slash = template.regex_data in SLASH_DATE_PATTERNS
+            
             for line in lines:
+                if needs_slash and '/' not in line:
+                    continue
                 line = line.strip()
                 if not line:
                     continue
                 
-                # Extract data, valor, and description using regex
-                date_match = re.search(template.regex_data, line)
-                value_match = re.search(template.regex_valor, line)
+                # Extract data, valor, and description using regex;
+                # lines without a date are dropped before searching the value
+                date_match = re_data.search(line)
+                if date_match is None:
+                    continue
+                value_match = re_valor.search(line)
                 
-                if date_match and value_match:
-                    # Extract description by removing date and value from line
-                    description = line
-                    description = re.sub(template.regex_data, '', description)
-                    description = re.sub(template.regex_valor, '', description)
-                    description = re.sub(template.regex_descricao, '', description)
-                    description = description.strip()
+                if value_match:
+                    if whole_line:
+                        description = ''
+                    else:
+                        # Extract description by removing date and value from line
+                        description = line
+                        description = re_data.sub('', description)
+                        description = re_valor.sub('', description)
+                        description = re_descricao.sub('', description)
+                        description = description.strip()
                     
                     if not description:
                         # If no description after cleaning, use the regex to capture it
-                        desc_match = re.search(template.regex_descricao, line)
+                        desc_match = re_descricao.search(line)
                         if desc_match:
                             description = desc_match.group(0).strip()
                     
                     # Parse date
                     date_str = date_match.group(0)
                     try:
-                        date_obj = datetime.strptime(date_str, '%d/%m/%Y')
-                        formatted_date = date_obj.strftime('%Y-%m-%d')
+                        formatted_date = _br_date_to_iso(date_str)
                     except ValueError:
                         logger.warning(f"Could not parse date: {date_str}")
                         continue
@@ -275,8 +392,7 @@ class PDFProcessor:
                     value_str = row[template.colunas_csv.get('valor', 2)]
                     
                     # Parse date
-                    date_obj = datetime.strptime(date_str, '%d/%m/%Y')
-                    formatted_date = date_obj.strftime('%Y-%m-%d')
+                    formatted_date = _br_date_to_iso(date_str)
                     
                     # Parse value
                     value_str = value_str.replace('.', '').replace(',', '.')
@@ -322,16 +438,31 @@ class PDFProcessor:
             
             transactions = []
             
-            for _, row in df.iterrows():
+            # Whole columns are read once instead of building a Series per row
+            try:
+                dates = df.iloc[:, template.colunas_csv.get('data', 0)].tolist()
+                descriptions = df.iloc[:, template.colunas_csv.get('descricao', 1)].tolist()
+                values = df.iloc[:, template.colunas_csv.get('valor', 2)].tolist()
+            except Exception as e:
+                # No row can be read with this column mapping
+                logger.warning(f"Error parsing CSV rows: {str(e)}")
+                return transactions
+            
+            # Statements repeat dates, so each distinct one is parsed once
+            formatted_dates = {}
+            
+            for date_value, description, value_value in zip(dates, descriptions, values):
                 try:
                     # Get column values
-                    date_str = str(row.iloc[template.colunas_csv.get('data', 0)])
-                    description = str(row.iloc[template.colunas_csv.get('descricao', 1)])
-                    value_str = str(row.iloc[template.colunas_csv.get('valor', 2)])
+                    date_str = str(date_value)
+                    description = str(description)
+                    value_str = str(value_value)
                     
                     # Parse date
-                    date_obj = datetime.strptime(date_str, '%d/%m/%Y')
-                    formatted_date = date_obj.strftime('%Y-%m-%d')
+                    formatted_date = formatted_dates.get(date_str)
+                    if formatted_date is None:
+                        formatted_date = _br_date_to_iso(date_str)
+                        formatted_dates[date_str] = formatted_date
                     
                     # Parse value
                     value_str = value_str.replace('.', '').replace(',', '.')
@@ -362,9 +493,11 @@ class PDFProcessor:
     
     def _process_ofx(self, filepath: str) -> List[Transaction]:
         """Process OFX file"""
+        if OfxParser is None:
+            logger.error("ofxparse library not available")
+            raise Exception("Biblioteca de processamento OFX não disponível")
+        
         try:
-            from ofxparse import OfxParser
-            
             with open(filepath, 'rb') as f:
                 ofx = OfxParser.parse(f)
             
@@ -401,9 +534,6 @@ class PDFProcessor:
             
             return transactions
         
-        except ImportError:
-            logger.error("ofxparse library not available")
-            raise Exception("Biblioteca de processamento OFX não disponível")
         except Exception as e:
             logger.error(f"Error processing OFX file: {str(e)}")
             raise
@@ -417,9 +547,7 @@ class PDFProcessor:
             
             if bank_template:
                 templates = FileHandler.load_bank_templates()
-                for template in templates:
-                    if template.banco.lower() == bank_template.lower():
-                        return template
+                return FileHandler.index_bank_templates_by_bank(templates).get(bank_template.lower())
             
             return None
         
@@ -437,16 +565,19 @@ class PDFProcessor:
             
             if file_extension == '.pdf':
                 try:
-                    import pdfplumber
-                    with pdfplumber.open(filepath) as pdf:
+                    # Only the first page is set up and parsed
+                    with pdfplumber.open(filepath, pages=[1]) as pdf:
                         first_page = pdf.pages[0]
-                        text = first_page.extract_text()
+                        try:
+                            text = first_page.extract_text().lower()
+                        finally:
+                            first_page.close()
                         
-                        if 'bradesco' in text.lower():
+                        if 'bradesco' in text:
                             return 'bradesco'
-                        elif 'itau' in text.lower() or 'itaú' in text.lower():
+                        elif 'itau' in text or 'itaú' in text:
                             return 'itau'
-                        elif 'banco do brasil' in text.lower():
+                        elif 'banco do brasil' in text:
                             return 'bb'
                         
                 except Exception:
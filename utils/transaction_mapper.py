@@ -1,13 +1,99 @@
-import re
 import logging
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from models import Transaction, AccountingMapping, CustomRule
 from utils.file_handlers import FileHandler
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional, fall back to substring checks
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
+# Informative balance lines, already lowercase like descricao_normalizada
+IGNORE_KEYWORDS = ("saldo do dia", "saldo anterior", "saldo atual")
+
+
+class KeywordMatcher:
+    """Find which registered keywords occur in a text.
+
+    With pyahocorasick installed every text is scanned once by an automaton,
+    whatever the number of keywords; otherwise each keyword is checked with
+    a plain substring test.
+    """
+
+    def __init__(self):
+        self._payloads: Dict[str, List[Any]] = {}
+        # Empty keywords are contained in any text
+        self._always: List[Any] = []
+        self._automaton = None
+
+    def add(self, keyword: str, payload: Any) -> None:
+        """Register a keyword with the payload reported when it matches"""
+        if not keyword:
+            self._always.append(payload)
+            return
+        self._payloads.setdefault(keyword, []).append(payload)
+        self._automaton = None
+
+    def find(self, text: str) -> List[Any]:
+        """Return the payloads of every keyword found in text"""
+        found = list(self._always)
+        if not self._payloads:
+            return found
+
+        if ahocorasick is not None:
+            automaton = self._automaton
+            if automaton is None:
+                # Built aside, so mappers sharing this matcher never see it half done
+                automaton = ahocorasick.Automaton()
+                for keyword, payloads in self._payloads.items():
+                    automaton.add_word(keyword, payloads)
+                automaton.make_automaton()
+                self._automaton = automaton
+            for _, payloads in automaton.iter(text):
+                found.extend(payloads)
+        else:
+            for keyword, payloads in self._payloads.items():
+                if keyword in text:
+                    found.extend(payloads)
+
+        return found
+
+
+class RuleMatcher:
+    """Index custom rules by their key term.
+
+    Exact rules are looked up by description and "contains" rules go through
+    a KeywordMatcher, so only rules whose term occurs in the description are
+    returned. Type and value conditions are left to matches_custom_rule.
+    """
+
+    def __init__(self, rules: List[CustomRule]):
+        self.rules = rules
+        self._exact: Dict[str, List[int]] = {}
+        self._contains = KeywordMatcher()
+
+        for index, rule in enumerate(rules):
+            term = rule.termo_chave_lower or ""
+            if rule.corresponde_exatamente:
+                self._exact.setdefault(term, []).append(index)
+            else:
+                self._contains.add(term, index)
+
+    def candidates(self, description: str) -> List[CustomRule]:
+        """Rules whose key term matches description, in rule order"""
+        indexes = set(self._contains.find(description))
+        indexes.update(self._exact.get(description, ()))
+        return [self.rules[index] for index in sorted(indexes)]
+
 
 class TransactionMapper:
+    # Matchers per source list, shared by every mapper: FileHandler returns
+    # the same list while its file is unchanged, so each is built once per
+    # version of the rules and mappings files
+    _shared_matchers: Dict[str, Tuple[list, Any]] = {}
+
     def __init__(self):
         self.scoring_weights = {
             "custom_rule": 10,
@@ -15,6 +101,9 @@ class TransactionMapper:
             "sub_mapping_keywords": 2,
             "main_mapping_keywords": 1,
         }
+        self._rule_matcher = None
+        self._mappings = None
+        self._mapping_keywords = None
 
     def map_transaction(self, transaction: Transaction) -> Transaction:
         """Map a transaction to accounting accounts"""
@@ -49,12 +138,27 @@ class TransactionMapper:
             logger.error(f"Error mapping transaction: {str(e)}")
             return transaction
 
+    def map_transactions(self, transactions: List[Transaction]) -> List[Transaction]:
+        """Map a batch of transactions in place and return them, in order.
+
+        The rules and mappings are loaded and indexed by the first
+        transaction and reused for the rest of the batch.
+        """
+        map_transaction = self.map_transaction
+        return [map_transaction(transaction) for transaction in transactions]
+
     def _check_custom_rules(self, transaction: Transaction) -> Optional[CustomRule]:
         """Check if transaction matches any custom rules"""
         try:
-            custom_rules = FileHandler.load_custom_rules()
+            if self._rule_matcher is None:
+                self._rule_matcher = self._shared_matcher(
+                    "rules", FileHandler.load_custom_rules(), RuleMatcher
+                )
 
-            for rule in custom_rules:
+            candidates = self._rule_matcher.candidates(
+                transaction.descricao_normalizada
+            )
+            for rule in candidates:
                 if self.matches_custom_rule(transaction, rule):
                     return rule
 
@@ -82,10 +186,10 @@ class TransactionMapper:
 
             # Check description match
             if rule.corresponde_exatamente:
-                if transaction.descricao_normalizada != rule.termo_chave.lower():
+                if transaction.descricao_normalizada != rule.termo_chave_lower:
                     return False
             else:
-                if rule.termo_chave.lower() not in transaction.descricao_normalizada:
+                if rule.termo_chave_lower not in transaction.descricao_normalizada:
                     return False
 
             # Check value match if required
@@ -103,16 +207,67 @@ class TransactionMapper:
             logger.error(f"Error checking custom rule match: {str(e)}")
             return False
 
+    def select_custom_rule_matches(
+        self, transactions: List[Transaction], rule: CustomRule
+    ) -> List[Transaction]:
+        """Return the transactions matching a custom rule, in order.
+
+        Same result as calling matches_custom_rule on each transaction, with
+        the rule's conditions resolved once and applied as whole-list filters.
+        """
+        try:
+            selected = transactions
+
+            required_type = {"entrada": "Crédito", "saida": "Débito"}.get(
+                rule.tipo_movimentacao_regra
+            )
+            if required_type:
+                selected = [
+                    t for t in selected if t.tipo_movimentacao == required_type
+                ]
+
+            term = rule.termo_chave_lower
+            if rule.corresponde_exatamente:
+                selected = [t for t in selected if t.descricao_normalizada == term]
+            else:
+                selected = [t for t in selected if term in t.descricao_normalizada]
+
+            if rule.considerar_valor:
+                if rule.valor_exato is not None:
+                    exact = rule.valor_exato
+                    selected = [t for t in selected if abs(t.valor - exact) <= 0.01]
+                elif rule.valor_min is not None and rule.valor_max is not None:
+                    low, high = rule.valor_min, rule.valor_max
+                    selected = [t for t in selected if low <= t.valor <= high]
+
+            return selected
+
+        except Exception:
+            # Odd data (e.g. a missing value): let the per-transaction check decide
+            return [t for t in transactions if self.matches_custom_rule(t, rule)]
+
     def _check_standard_mappings(
         self, transaction: Transaction
     ) -> Optional[Tuple[AccountingMapping, dict, int]]:
         """Check standard mappings and return best match with score"""
         try:
-            mappings = FileHandler.load_accounting_mappings()
+            mappings = self._load_mappings()
+            main_hits, exception_hits, sub_hits = self._keyword_hits(
+                transaction.descricao_normalizada
+            )
+            w_regex = self.scoring_weights["regex_advanced"]
+            w_sub = self.scoring_weights["sub_mapping_keywords"]
+            w_main = self.scoring_weights["main_mapping_keywords"]
             best_match = None
             best_score = 0
+            # Only a strictly higher score replaces the best match, so the
+            # scan can stop once nothing left could beat it
+            top_score = max(w_regex, w_sub, w_main)
+
+            for index, mapping in enumerate(mappings):
+                if best_score >= top_score:
+                    break
 
-            for mapping in mappings:
                 # Check if transaction type is compatible
                 if (
                     mapping.tipo_transacao == "entrada"
@@ -126,13 +281,13 @@ class TransactionMapper:
                     continue
 
                 # Check exceptions
-                if self._has_exceptions(transaction, mapping):
+                if index in exception_hits:
                     continue
 
                 # Check regex advanced
                 regex_match = self._check_regex_advanced(transaction, mapping)
                 if regex_match:
-                    score = self.scoring_weights["regex_advanced"]
+                    score = w_regex
                     if score > best_score:
                         best_match = (
                             mapping,
@@ -143,9 +298,10 @@ class TransactionMapper:
                     continue
 
                 # Check sub-mappings
-                sub_mapping_match = self._check_sub_mappings(transaction, mapping)
-                if sub_mapping_match:
-                    score = self.scoring_weights["sub_mapping_keywords"]
+                sub_index = sub_hits.get(index)
+                if sub_index is not None:
+                    sub_mapping_match = mapping.sub_mapeamentos_lower[sub_index][0]
+                    score = w_sub
                     if score > best_score:
                         best_match = (
                             mapping,
@@ -156,13 +312,12 @@ class TransactionMapper:
                     continue
 
                 # Check main mapping keywords
-                main_mapping_match = self._check_main_keywords(transaction, mapping)
-                if main_mapping_match:
-                    score = self.scoring_weights["main_mapping_keywords"]
+                if index in main_hits:
+                    score = w_main
                     if score > best_score:
                         best_match = (
                             mapping,
-                            {"type": "main_mapping", "data": main_mapping_match},
+                            {"type": "main_mapping", "data": True},
                             score,
                         )
                         best_score = score
@@ -173,29 +328,70 @@ class TransactionMapper:
             logger.error(f"Error checking standard mappings: {str(e)}")
             return None
 
-    def _has_exceptions(
-        self, transaction: Transaction, mapping: AccountingMapping
-    ) -> bool:
-        """Check if transaction has exceptions that exclude this mapping"""
-        try:
-            for exception in mapping.excecoes:
-                if exception.lower() in transaction.descricao_normalizada:
-                    return True
-            return False
-
-        except Exception as e:
-            logger.error(f"Error checking exceptions: {str(e)}")
-            return False
+    def _load_mappings(self) -> List[AccountingMapping]:
+        """Load mappings once per mapper and index their main keywords,
+        exceptions and sub-mapping keywords in a single KeywordMatcher"""
+        if self._mappings is None:
+            mappings = FileHandler.load_accounting_mappings()
+            self._mapping_keywords = self._shared_matcher(
+                "mappings", mappings, self._index_mapping_keywords
+            )
+            self._mappings = mappings
+        return self._mappings
+
+    @classmethod
+    def _shared_matcher(cls, name: str, items: list, build) -> Any:
+        """Matcher built from items, reused while items is the same list"""
+        cached = cls._shared_matchers.get(name)
+        if cached is not None and cached[0] is items:
+            return cached[1]
+        matcher = build(items)
+        cls._shared_matchers[name] = (items, matcher)
+        return matcher
+
+    @staticmethod
+    def _index_mapping_keywords(mappings: List[AccountingMapping]) -> KeywordMatcher:
+        """KeywordMatcher of every mapping's keywords, tagged by kind and index"""
+        keywords = KeywordMatcher()
+        for index, mapping in enumerate(mappings):
+            for keyword in mapping.palavras_chave_lower:
+                keywords.add(keyword, ("main", index, None))
+            for keyword in mapping.excecoes_lower:
+                keywords.add(keyword, ("exception", index, None))
+            for sub_index, (_, sub_keywords) in enumerate(
+                mapping.sub_mapeamentos_lower
+            ):
+                for keyword in sub_keywords:
+                    keywords.add(keyword, ("sub", index, sub_index))
+        return keywords
+
+    def _keyword_hits(
+        self, description: str
+    ) -> Tuple[set, set, Dict[int, int]]:
+        """Indexes of the mappings whose main keywords and exceptions occur in
+        description, and the first matching sub-mapping of each mapping"""
+        main_hits = set()
+        exception_hits = set()
+        sub_hits: Dict[int, int] = {}
+        for kind, index, sub_index in self._mapping_keywords.find(description):
+            if kind == "main":
+                main_hits.add(index)
+            elif kind == "exception":
+                exception_hits.add(index)
+            elif sub_index < sub_hits.get(index, sub_index + 1):
+                sub_hits[index] = sub_index
+        return main_hits, exception_hits, sub_hits
 
     def _check_regex_advanced(
         self, transaction: Transaction, mapping: AccountingMapping
     ) -> Optional[str]:
         """Check regex advanced pattern"""
         try:
-            if not mapping.regex_avancado:
+            # Compiled once per mapping, None when it has no pattern
+            pattern = mapping.compiled_regex_avancado
+            if pattern is None:
                 return None
 
-            pattern = re.compile(mapping.regex_avancado, re.IGNORECASE)
             match = pattern.search(transaction.descricao_normalizada)
 
             return match.group(0) if match else None
@@ -204,35 +400,6 @@ class TransactionMapper:
             logger.error(f"Error checking regex advanced: {str(e)}")
             return None
 
-    def _check_sub_mappings(
-        self, transaction: Transaction, mapping: AccountingMapping
-    ) -> Optional[dict]:
-        """Check sub-mappings keywords"""
-        try:
-            for sub_mapping in mapping.sub_mapeamentos:
-                for keyword in sub_mapping.get("palavras_chave", []):
-                    if keyword.lower() in transaction.descricao_normalizada:
-                        return sub_mapping
-            return None
-
-        except Exception as e:
-            logger.error(f"Error checking sub-mappings: {str(e)}")
-            return None
-
-    def _check_main_keywords(
-        self, transaction: Transaction, mapping: AccountingMapping
-    ) -> Optional[bool]:
-        """Check main mapping keywords"""
-        try:
-            for keyword in mapping.palavras_chave:
-                if keyword.lower() in transaction.descricao_normalizada:
-                    return True
-            return None
-
-        except Exception as e:
-            logger.error(f"Error checking main keywords: {str(e)}")
-            return None
-
     def _apply_custom_mapping(
         self, transaction: Transaction, rule: CustomRule
     ) -> Transaction:
@@ -252,10 +419,8 @@ class TransactionMapper:
     def _should_ignore_transaction(self, transaction: Transaction) -> bool:
         """Check if transaction should be ignored (like SALDO DO DIA)"""
         try:
-            ignore_keywords = ["saldo do dia", "saldo anterior", "saldo atual"]
-
-            for keyword in ignore_keywords:
-                if keyword.lower() in transaction.descricao_normalizada:
+            for keyword in IGNORE_KEYWORDS:
+                if keyword in transaction.descricao_normalizada:
                     return True
 
             return False
@@ -271,7 +436,7 @@ class TransactionMapper:
     ) -> Transaction:
         """Apply standard mapping to transaction"""
         try:
-            mapping, match_data, score = mapping_data
+            mapping, match_data, _ = mapping_data
 
             if match_data["type"] == "sub_mapping":
                 # Use sub-mapping data
@@ -300,3 +465,22 @@ class TransactionMapper:
         except Exception as e:
             logger.error(f"Error applying standard mapping: {str(e)}")
             return transaction
+
+
+def map_transaction_fields(
+    transactions: List[Transaction],
+) -> List[Tuple[str, str, str, str]]:
+    """Map a chunk of transactions and return their accounting fields.
+
+    Module-level so it can run in a worker process; the mapped objects live in
+    the worker, so only the resulting fields are sent back, in input order.
+    """
+    return [
+        (
+            mapped.rotulo_contabil,
+            mapped.conta_debito,
+            mapped.conta_credito,
+            mapped.historico_contabil,
+        )
+        for mapped in TransactionMapper().map_transactions(transactions)
+    ]